@@ -1,26 +1,189 @@
+import multiprocessing
+import threading
 import whisper
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 from input_preprocessing.documents.utils.core import Chunk
+from input_preprocessing.audio.vad import EnergyVAD, SpeechMap, frame_energy
 from datetime import timedelta
 
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE
+
+# Rough resident memory of one loaded model on CPU, used to size worker pools
+MODEL_MEMORY = {
+    "tiny": 1 * 1024 ** 3,
+    "base": 1 * 1024 ** 3,
+    "small": 2 * 1024 ** 3,
+    "medium": 5 * 1024 ** 3,
+    "turbo": 6 * 1024 ** 3,
+    "large": 10 * 1024 ** 3,
+}
+
+_worker_transcriber = None
+
+
+def _init_transcription_worker(model_name, torch_threads=None, vad=None):
+    """Load the Whisper model once per worker process."""
+    global _worker_transcriber
+    if torch_threads:
+        # Keep the workers' intra-op threads from oversubscribing the cores
+        import torch
+        torch.set_num_threads(torch_threads)
+    _worker_transcriber = Transcriber(model_name, vad=vad)
+    _worker_transcriber.model  # load now rather than on the first job
+
+
+def _transcribe_window(audio, offset):
+    """Transcribe one window of samples and shift its segments by offset seconds."""
+    result = _worker_transcriber.model.transcribe(audio)
+    segments = [
+        {"start": segment["start"] + offset, "end": segment["end"] + offset, "text": segment["text"]}
+        for segment in result["segments"]
+    ]
+    return segments, result["text"]
+
+
+def _transcribe_file(file_path):
+    return _worker_transcriber.audio_to_sources(file_path)
+
+
+def split_on_silence(audio, window_seconds=600, search_seconds=15, frame_seconds=0.03):
+    """
+    Split audio into (start, stop) sample ranges of roughly window_seconds.
+
+    Each cut is placed at the quietest frame within search_seconds of the
+    nominal boundary, so windows rarely end in the middle of a word. The
+    last window absorbs any remainder shorter than a full window.
+    """
+    window = int(window_seconds * SAMPLE_RATE)
+    search = int(search_seconds * SAMPLE_RATE)
+    frame = int(frame_seconds * SAMPLE_RATE)
+    energy = frame_energy(audio, frame)
+    cuts = [0]
+    while len(audio) - cuts[-1] > window:
+        target = cuts[-1] + window
+        lo = max(cuts[-1] // frame + 1, (target - search) // frame)
+        hi = min(len(energy), (target + search) // frame + 1)
+        cut = (lo + int(np.argmin(energy[lo:hi]))) * frame if lo < hi else target
+        cuts.append(cut)
+    return list(zip(cuts, cuts[1:] + [len(audio)]))
+
 
 class AudioChunk(Chunk):
+    __slots__ = ()
 
     def __init__(self, source, start, end, text):
-        self.source = source
-        self.type = "audio"
-        self.start = start
-        self.end = end
-        self.text = text
+        super().__init__(source, "audio", start, end, text)
 
     def __str__(self):
         return f"AudioChunk(source={self.source}, timestamp={self.start}:{self.end}, text={self.text})"
 
 
+class TranscriberPool:
+    """
+    Long-lived Whisper worker processes, each loading the model once.
+
+    The workers stay warm between calls, so a directory of recordings only
+    pays for model loading once per worker. The worker count is capped by
+    memory_budget (bytes) using the per-model estimates in MODEL_MEMORY.
+    """
+
+    def __init__(self, model="base", max_workers=None, memory_budget=None, vad=None):
+        self.model_name = model
+        # VAD applied by the workers to whole files given to transcribe_files
+        self.vad = vad
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        if memory_budget is not None:
+            model_memory = MODEL_MEMORY.get(model.split(".")[0].split("-")[0], MODEL_MEMORY["large"])
+            self.max_workers = max(1, min(self.max_workers, memory_budget // model_memory))
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            torch_threads = max(1, multiprocessing.cpu_count() // self.max_workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_transcription_worker,
+                initargs=(self.model_name, torch_threads, self.vad),
+            )
+        return self._executor
+
+    def submit_window(self, audio, offset):
+        """Queue one window of samples; the future yields (segments, text)."""
+        return self._get_executor().submit(_transcribe_window, audio, offset)
+
+    def iter_files(self, file_paths):
+        """Yield (chunks, transcript) for each file, in order, as they complete."""
+        return self._get_executor().map(_transcribe_file, file_paths)
+
+    def transcribe_files(self, file_paths):
+        """Transcribe several audio files in parallel and return their results in order."""
+        return list(self.iter_files(file_paths))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
 class Transcriber:
+    """
+    Whisper transcription of audio files into merged AudioChunks.
+
+    With workers > 1 or a shared TranscriberPool, files longer than
+    window_seconds are transcribed in long-audio mode: the samples are split
+    at low-energy points into windows that worker processes (each holding
+    its own model) transcribe concurrently, and the segments are stitched
+    back with absolute timestamps. Context does not carry over between
+    windows.
+
+    With vad set (True or an EnergyVAD), only the detected speech regions
+    are sent to the model and segment timestamps are mapped back to the
+    original recording; last_vad_stats reports how much audio was skipped.
+    Both modes compose: long-audio windows are cut from the speech-only
+    audio.
+    """
+
+    def __init__(self, model="base", workers=1, window_seconds=600, pool=None, vad=None):
+        self.model_name = model
+        self.workers = workers
+        self.window_seconds = window_seconds
+        self.pool = pool
+        self.vad = EnergyVAD() if vad is True else vad
+        self.last_vad_stats = None
+        self._owns_pool = False
+        self._model = None
+        # Whisper installs kv-cache hooks on the model while decoding, so one
+        # model must never run two transcriptions at once
+        self._lock = threading.RLock()
+
+    @property
+    def model(self):
+        # Loaded on first use; long recordings only need the workers' copies
+        with self._lock:
+            if self._model is None:
+                self._model = whisper.load_model(self.model_name)
+            return self._model
+
+    def _run_model(self, audio):
+        """Transcribe a path or samples on this process's model, one call at a time."""
+        with self._lock:
+            return self.model.transcribe(audio)
 
-    def __init__(self, model="base"):
-        self.model = whisper.load_model(model)
+    def _get_pool(self):
+        with self._lock:
+            if self.pool is None:
+                self.pool = TranscriberPool(self.model_name, self.workers)
+                self._owns_pool = True
+            return self.pool
+
+    def shutdown(self):
+        # A pool passed in by the caller is theirs to shut down
+        if self._owns_pool:
+            self.pool.shutdown()
+            self.pool = None
+            self._owns_pool = False
 
     def _merge_audio_chunks(self, chunks, threshold=200):
         merged_chunks = []
@@ -48,10 +211,52 @@ class Transcriber:
             merged_chunks.append(current_chunk)
         return merged_chunks
 
-    def audio_to_sources(self, file_path):
-        transcript = self.model.transcribe(file_path)
+    def _transcribe(self, file_path):
+        """Return the segments (in absolute seconds) and full text of a file."""
+        long_audio = self.workers > 1 or self.pool is not None
+        if not long_audio and self.vad is None:
+            transcript = self._run_model(file_path)
+            return transcript["segments"], transcript["text"]
+
+        audio = whisper.load_audio(file_path)
+        if self.vad is None:
+            return self._transcribe_samples(audio, long_audio)
+
+        regions = self.vad.detect(audio)
+        if not regions:
+            # Never drop a whole recording on the VAD's word alone
+            print(f"VAD found no speech in {file_path}; transcribing all of it")
+            regions = [(0, len(audio))]
+        speech_map = SpeechMap(regions, len(audio))
+        self.last_vad_stats = speech_map.stats()
+        print(
+            f"VAD skipped {self.last_vad_stats['skipped_seconds']:.1f}s of "
+            f"{self.last_vad_stats['total_seconds']:.1f}s ({self.last_vad_stats['skipped_ratio']:.0%})"
+        )
+        segments, text = self._transcribe_samples(speech_map.extract(audio), long_audio)
+        return speech_map.remap_segments(segments), text
+
+    def _transcribe_samples(self, audio, long_audio):
+        """Return the segments (in seconds from the start of audio) and full text of samples."""
+        windows = split_on_silence(audio, self.window_seconds) if long_audio else [(0, len(audio))]
+        if len(windows) == 1:
+            transcript = self._run_model(audio)
+            return transcript["segments"], transcript["text"]
+
+        pool = self._get_pool()
+        futures = [pool.submit_window(audio[start:stop], start / SAMPLE_RATE) for start, stop in windows]
+        segments = []
+        texts = []
+        for future in futures:
+            window_segments, window_text = future.result()
+            segments.extend(window_segments)
+            texts.append(window_text.strip())
+        return segments, " ".join(texts)
+
+    @staticmethod
+    def _segments_to_chunks(file_path, segments):
         audio_chunks = []
-        for segment in transcript["segments"]:
+        for segment in segments:
             start_time = str(timedelta(seconds=int(segment["start"])))
             end_time = str(timedelta(seconds=int(segment["end"])))
             audio_chunks.append(
@@ -62,10 +267,15 @@ class Transcriber:
                     text=segment["text"],
                 )
             )
+        return audio_chunks
+
+    def audio_to_sources(self, file_path):
+        segments, text = self._transcribe(file_path)
+        audio_chunks = self._segments_to_chunks(file_path, segments)
         merged_chunks = self._merge_audio_chunks(audio_chunks)
-        print(f"Number of original segments: {len(transcript['segments'])}")
+        print(f"Number of original segments: {len(segments)}")
         print(f"Number of merged chunks: {len(merged_chunks)}")
-        return merged_chunks, transcript["text"]
+        return merged_chunks, text
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def frame_energy(audio, frame_size):
+    """RMS energy of consecutive non-overlapping frames."""
+    n_frames = len(audio) // frame_size
+    frames = audio[:n_frames * frame_size].reshape(n_frames, frame_size)
+    return np.sqrt(np.mean(np.square(frames), axis=1))
+
+
+class EnergyVAD:
+    """
+    Lightweight energy-based voice activity detection.
+
+    Frames louder than the recording's noise floor (its noise_percentile
+    frame energy, in dB) by margin_db, and louder than the absolute floor
+    min_energy_db (dBFS), count as speech. A recording whose dynamic range
+    is below margin_db has no silence to find and is returned as one
+    region. Speech runs shorter than min_speech_seconds are dropped, every
+    region is padded by padding_seconds on both sides, and regions
+    separated by less than min_gap_seconds are merged so words are not
+    clipped at the edges.
+    """
+
+    def __init__(self, frame_seconds=0.03, margin_db=10.0, noise_percentile=10, min_energy_db=-50.0,
+                 padding_seconds=0.3, min_gap_seconds=1.0, min_speech_seconds=0.25, sample_rate=SAMPLE_RATE):
+        self.frame_seconds = frame_seconds
+        self.margin_db = margin_db
+        self.min_energy_db = min_energy_db
+        self.noise_percentile = noise_percentile
+        self.padding_seconds = padding_seconds
+        self.min_gap_seconds = min_gap_seconds
+        self.min_speech_seconds = min_speech_seconds
+        self.sample_rate = sample_rate
+
+    def detect(self, audio):
+        """Return speech regions as sorted, non-overlapping (start, stop) sample ranges."""
+        frame = int(self.frame_seconds * self.sample_rate)
+        energy = frame_energy(audio, frame)
+        if not len(energy):
+            return [(0, len(audio))] if len(audio) else []
+        energy_db = 20 * np.log10(energy + 1e-10)
+        noise_floor = np.percentile(energy_db, self.noise_percentile)
+        if np.percentile(energy_db, 100 - self.noise_percentile) - noise_floor < self.margin_db:
+            # Too little dynamic range to tell speech from silence: all loud or all quiet
+            return [(0, len(audio))] if noise_floor > self.min_energy_db else []
+        speech = energy_db > max(noise_floor + self.margin_db, self.min_energy_db)
+
+        # Start and stop frames of each run of speech frames
+        edges = np.diff(np.concatenate([[False], speech, [False]]).astype(np.int8))
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1)
+        keep = (stops - starts) * self.frame_seconds >= self.min_speech_seconds
+        starts, stops = starts[keep] * frame, stops[keep] * frame
+
+        padding = int(self.padding_seconds * self.sample_rate)
+        min_gap = int(self.min_gap_seconds * self.sample_rate)
+        regions = []
+        for start, stop in zip(np.maximum(starts - padding, 0), np.minimum(stops + padding, len(audio))):
+            if regions and start - regions[-1][1] < min_gap:
+                regions[-1] = (regions[-1][0], int(stop))
+            else:
+                regions.append((int(start), int(stop)))
+        return regions
+
+
+class SpeechMap:
+    """
+    Maps between the original audio and the concatenation of its speech regions.
+
+    Whisper only sees the concatenated regions; segment timestamps in that
+    compressed timeline are mapped back to the original recording.
+    """
+
+    def __init__(self, regions, total_samples, sample_rate=SAMPLE_RATE):
+        self.regions = regions
+        self.total_samples = total_samples
+        self.sample_rate = sample_rate
+        lengths = np.array([stop - start for start, stop in regions], dtype=np.int64)
+        self._original_starts = np.array([start for start, _ in regions], dtype=np.int64)
+        self._compressed_starts = np.concatenate([[0], np.cumsum(lengths)[:-1]]) if len(regions) else lengths
+        self.speech_samples = int(lengths.sum())
+
+    def extract(self, audio):
+        """Concatenate the speech regions of audio."""
+        if not self.regions:
+            return audio[:0]
+        return np.concatenate([audio[start:stop] for start, stop in self.regions])
+
+    def to_original(self, seconds, is_end=False):
+        """Original-recording time of a compressed-timeline time in seconds."""
+        position = seconds * self.sample_rate
+        # An end exactly on a region boundary belongs to the region it closes
+        side = "left" if is_end else "right"
+        region = max(np.searchsorted(self._compressed_starts, position, side=side) - 1, 0)
+        offset = position - self._compressed_starts[region]
+        return float(self._original_starts[region] + offset) / self.sample_rate
+
+    def remap_segments(self, segments):
+        return [
+            dict(segment, start=self.to_original(segment["start"]), end=self.to_original(segment["end"], True))
+            for segment in segments
+        ]
+
+    def stats(self):
+        total = self.total_samples / self.sample_rate
+        speech = self.speech_samples / self.sample_rate
+        return {
+            "total_seconds": total,
+            "speech_seconds": speech,
+            "skipped_seconds": total - speech,
+            "skipped_ratio": (total - speech) / total if total else 0.0,
+            "regions": len(self.regions),
+        }
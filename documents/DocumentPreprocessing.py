@@ -2,17 +2,80 @@ from abc import ABC, abstractmethod
 import os
 import time
 import json
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Iterator
+from input_preprocessing.documents.filters.extract import TextExtractor
+
+
+class JsonPageWriter:
+    """Streams a {"type": ..., "pages": [...]} document to disk one page at a time."""
+
+    def __init__(self, filename: str, doc_type: str):
+        self._file = open(filename, "w", encoding="utf-8")
+        self._file.write(f'{{"type": {json.dumps(doc_type)}, "pages": [')
+        self._first = True
+
+    def write_page(self, page: Dict) -> None:
+        self._file.write("\n" if self._first else ",\n")
+        self._file.write(json.dumps(page, indent=4, ensure_ascii=False))
+        self._first = False
+
+    def close(self) -> None:
+        self._file.write("\n]}\n")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JsonLinesPageWriter(JsonPageWriter):
+    """
+    Compact intermediate format: a {"type": ...} header line followed by one
+    JSON record per page, so readers never need the whole document in memory.
+    """
+
+    def __init__(self, filename: str, doc_type: str):
+        self._file = open(filename, "w", encoding="utf-8")
+        self._file.write(json.dumps({"type": doc_type}) + "\n")
+
+    def write_page(self, page: Dict) -> None:
+        self._file.write(json.dumps(page, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+PAGE_WRITERS = {
+    "json": JsonPageWriter,
+    "jsonl": JsonLinesPageWriter,
+}
 
 
 class DocumentProcessor(ABC):
-    def __init__(self, path: str,output_path: str):
+    doc_type = None
+
+    def __init__(self, path: str,output_path: str, cache=None, ocr_pool=None, output_format: str = "json",
+                 page_batch_size: int = 64):
+        if output_format not in PAGE_WRITERS:
+            raise ValueError(f"Unknown output format: {output_format}. "
+                             f"Available formats: {', '.join(PAGE_WRITERS.keys())}")
         self.path = path
+        self.cache = cache
+        self.ocr_pool = ocr_pool
+        self.output_format = output_format
+        # Pages are OCRed and written in batches of this size
+        self.page_batch_size = page_batch_size
+        # (image_path, content) pairs waiting for the OCR stage
+        self._ocr_jobs = []
         self.folder_name = f"{os.path.splitext(os.path.basename(path))[0]}"
         self.folder_path = os.path.join(output_path, self.folder_name)
         self.folder_image_path = os.path.join(self.folder_path, 'images')
         self.folder_text_path = os.path.join(self.folder_path, 'text')
         self.stats = self._init_stats()
+        # Exception that stopped the last extraction; extract_text_and_images then returns ""
+        self.error = None
         
         os.makedirs(self.folder_image_path, exist_ok=True)
         os.makedirs(self.folder_text_path, exist_ok=True)
@@ -30,12 +93,89 @@ class DocumentProcessor(ABC):
     def extract_text_and_images(self) -> str:
         pass
 
-    def write_json_to_file(self, data: Dict, filename: str) -> None:
-        try:
-            with open(filename, "w", encoding="utf-8") as json_file:
-                json.dump(data, json_file, indent=4, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error writing JSON to file: {e}")
+    @abstractmethod
+    def _iter_pages(self) -> Iterator[Dict]:
+        """Yield raw page dicts, queueing their images for the OCR stage."""
+        pass
+
+    def iter_pages(self) -> Iterator[Dict]:
+        """
+        Yield finished pages, running the OCR stage once per page_batch_size
+        pages. The OCR cache is saved once the last page has been OCRed.
+        """
+        pending = []
+        for page in self._iter_pages():
+            pending.append(page)
+            if len(pending) >= self.page_batch_size:
+                self._run_ocr_stage()
+                yield from pending
+                pending = []
+        self._run_ocr_stage()
+        TextExtractor.ocr_cache.save()
+        yield from pending
+
+    def output_filename(self) -> str:
+        return os.path.join(self.folder_text_path, f"{self.folder_name}.{self.output_format}")
+
+    def write_pages(self, filename: str) -> None:
+        """Stream every page to filename as soon as it is extracted."""
+        with PAGE_WRITERS[self.output_format](filename, self.doc_type) as writer:
+            for page in self.iter_pages():
+                writer.write_page(page)
+
+    def iter_and_cache_pages(self) -> Iterator[Dict]:
+        """
+        Yield finished pages while also streaming them to the output file, and
+        record that file in the cache once every page has been written, so an
+        in-memory run still serves later re-uploads from the cache.
+        """
+        filename = self.output_filename()
+        with PAGE_WRITERS[self.output_format](filename, self.doc_type) as writer:
+            for page in self.iter_pages():
+                writer.write_page(page)
+                yield page
+        self._store_in_cache(filename)
+
+    def cache_config(self) -> Dict[str, Any]:
+        """Settings that change the extracted output and so belong in the cache key."""
+        return {"processor": self.__class__.__name__, "output_format": self.output_format}
+
+    def _cached_output(self) -> Optional[str]:
+        """Return the JSON path of a previous extraction of the same content, if any."""
+        if self.cache is None:
+            return None
+        self._cache_key = self.cache.make_key(self.path, self.cache_config())
+        json_path = self.cache.get(self._cache_key)
+        if json_path:
+            print(f"Cache hit for {self.path}: {json_path}")
+        return json_path
+
+    def _store_in_cache(self, filename: str) -> None:
+        if self.cache is not None and filename:
+            self.cache.put(self._cache_key, filename, self.folder_path)
+
+    def _queue_ocr(self, image_path: str, content: Dict) -> None:
+        """Defer OCR of an image until the OCR stage runs for the document."""
+        self._ocr_jobs.append((image_path, content))
+
+    def _run_ocr_stage(self) -> None:
+        """OCR every queued image in one batch and attach the text to its content entry."""
+        jobs, self._ocr_jobs = self._ocr_jobs, []
+        image_paths = [image_path for image_path, _ in jobs]
+        if self.ocr_pool is not None:
+            texts = self.ocr_pool.run(image_paths)
+        else:
+            texts = []
+            for image_path in image_paths:
+                with open(image_path, "rb") as img_file:
+                    texts.append(TextExtractor.extract_text_from_image(img_file.read()))
+
+        for (_, content), ocr_text in zip(jobs, texts):
+            if ocr_text:
+                content["ocr_text"] = ocr_text
+                self.stats["total_ocr_text_blocks"] += 1
+            else:
+                self.stats["total_images_extracted"] += 1
 
     def print_stats(self) -> None:
         print(f"\n=== {self.__class__.__name__} Processing Stats ===")
@@ -1,19 +1,265 @@
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageFilter
+import hashlib
 import io
+import json
+import math
 import os
+import threading
+from input_preprocessing.documents.utils.cache import file_lock
+
+
+def image_digest(image_blob):
+    """Content hash used to recognise identical images."""
+    return hashlib.sha1(image_blob).hexdigest()
+
+
+class OCRCache:
+    """
+    Memoizes OCR results by image-bytes hash.
+
+    Results are kept in memory and, when a path is given, persisted as JSON
+    so later runs can reuse them. Saving merges with whatever is already on
+    disk under an exclusive lock on ``<path>.lock``, so several worker
+    processes can share one cache file. Document processors save once per
+    document.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._results = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        if path:
+            self._results.update(self._read(path))
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def __contains__(self, digest):
+        return digest in self._results
+
+    def get(self, digest):
+        return self._results.get(digest)
+
+    def put(self, digest, text):
+        with self._lock:
+            self._results[digest] = text
+            self._dirty = True
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with file_lock(f"{self.path}.lock", self._lock):
+            results = self._read(self.path)
+            results.update(self._results)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+class OCRFilter:
+    """
+    Cheap pre-classification run before tesseract.
+
+    Tiny icons and images without text-like edges are skipped. Edge density
+    is measured per tile_size-pixel tile of a 512-pixel thumbnail and the
+    densest tile decides, so a title or caption on a large, mostly empty
+    canvas is still OCRed. The entropy only tells flat images apart from
+    other edgeless ones in the stats, since text on a plain background has
+    very low entropy (a bilevel scan is at most 1 bit). Images that do go to
+    OCR are converted to grayscale, downscaled to the target DPI and
+    binarized.
+    """
+
+    def __init__(self, min_width=32, min_height=16, min_entropy=0.5, min_edge_density=0.05, tile_size=32,
+                 target_dpi=300, max_side=3000, binarize=True):
+        self.min_width = min_width
+        self.min_height = min_height
+        self.min_entropy = min_entropy
+        self.min_edge_density = min_edge_density
+        self.tile_size = tile_size
+        self.target_dpi = target_dpi
+        self.max_side = max_side
+        self.binarize = binarize
+
+    @staticmethod
+    def _entropy(histogram):
+        total = sum(histogram)
+        if not total:
+            return 0.0
+        return -sum(c / total * math.log2(c / total) for c in histogram if c)
+
+    def _edge_density(self, gray):
+        """Share of edge pixels in the densest tile."""
+        # Text produces many sharp edges; work on a thumbnail to keep this cheap
+        thumb = gray.copy()
+        thumb.thumbnail((512, 512))
+        edges = thumb.filter(ImageFilter.FIND_EDGES)
+        # The filter leaves the 1-pixel border unprocessed, so leave it out, along
+        # with the partial tiles whose few pixels would make their density noisy
+        tile = max(1, min(self.tile_size, edges.width - 2, edges.height - 2))
+        width, height = (edges.width - 2) // tile * tile, (edges.height - 2) // tile * tile
+        edges = edges.crop((1, 1, 1 + width, 1 + height)).point(lambda p: 255 if p >= 64 else 0)
+        # Box-averaging the edge mask over each tile gives the tile's edge density
+        return edges.reduce(tile).getextrema()[1] / 255
+
+    def skip_reason(self, image):
+        """Return why an image should not be OCRed, or None to OCR it."""
+        width, height = image.size
+        if width < self.min_width or height < self.min_height:
+            return "skipped_small"
+        gray = image.convert("L")
+        if self._edge_density(gray) >= self.min_edge_density:
+            return None
+        if self._entropy(gray.histogram()) < self.min_entropy:
+            return "skipped_low_entropy"
+        return "skipped_no_text"
+
+    @staticmethod
+    def _otsu_threshold(histogram):
+        total = sum(histogram)
+        sum_all = sum(i * c for i, c in enumerate(histogram))
+        sum_background = weight_background = 0
+        best_threshold, best_variance = 127, 0.0
+        for i, count in enumerate(histogram):
+            weight_background += count
+            if weight_background == 0:
+                continue
+            weight_foreground = total - weight_background
+            if weight_foreground == 0:
+                break
+            sum_background += i * count
+            mean_background = sum_background / weight_background
+            mean_foreground = (sum_all - sum_background) / weight_foreground
+            variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+            if variance > best_variance:
+                best_threshold, best_variance = i, variance
+        return best_threshold
+
+    def prepare(self, image):
+        """Grayscale, downscale to the target DPI and optionally binarize."""
+        dpi = image.info.get("dpi")
+        image = image.convert("L")
+        scale = 1.0
+        if dpi and dpi[0] and dpi[0] > self.target_dpi:
+            scale = self.target_dpi / float(dpi[0])
+        longest = max(image.size) * scale
+        if longest > self.max_side:
+            scale *= self.max_side / longest
+        if scale < 1.0:
+            size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+            image = image.resize(size, Image.LANCZOS)
+        if self.binarize:
+            threshold = self._otsu_threshold(image.histogram())
+            image = image.point(lambda p: 255 if p > threshold else 0)
+        return image
 
 
 class TextExtractor:
+    ocr_cache = OCRCache()
+    # Set to None to OCR every image at full resolution
+    ocr_filter = OCRFilter()
+    ocr_stats = {
+        "ocr_cache_hits": 0,
+        "skipped_small": 0,
+        "skipped_low_entropy": 0,
+        "skipped_no_text": 0,
+        "ocr_performed": 0,
+    }
+    _stats_lock = threading.Lock()
+    # Long-lived tesserocr handle; when unset every call spawns tesseract
+    _tess_api = None
+
+    @classmethod
+    def configure_ocr_cache(cls, path=None):
+        """Replace the process-wide OCR cache, optionally persisted at path."""
+        cls.ocr_cache = OCRCache(path)
+        return cls.ocr_cache
+
+    @classmethod
+    def use_persistent_engine(cls):
+        """
+        Keep one tesseract engine loaded for this process via tesserocr, so
+        OCR calls skip the per-image subprocess spawn. Falls back to
+        pytesseract when tesserocr is not installed.
+        """
+        try:
+            import tesserocr
+        except ImportError:
+            return False
+        if cls._tess_api is None:
+            cls._tess_api = tesserocr.PyTessBaseAPI()
+        return True
+
+    @classmethod
+    def _count(cls, key):
+        with cls._stats_lock:
+            cls.ocr_stats[key] += 1
+
+    @classmethod
+    def get_ocr_stats(cls):
+        """Per-image counters of cache hits, skipped and OCRed images."""
+        with cls._stats_lock:
+            return dict(cls.ocr_stats)
+
+    @classmethod
+    def reset_ocr_stats(cls):
+        with cls._stats_lock:
+            for key in cls.ocr_stats:
+                cls.ocr_stats[key] = 0
+
     @staticmethod
-    def extract_text_from_image(image_blob):
+    def _image_to_string(image):
+        api = TextExtractor._tess_api
+        if api is not None:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        return pytesseract.image_to_string(image)
+
+    @staticmethod
+    def ocr_image(image_blob):
+        """
+        Classify and OCR an image without touching the cache.
+
+        Returns (text, outcome) where outcome is the ocr_stats counter the
+        image falls under. text is None when the image could not be read.
+        Only 'ocr_performed' results should be cached: skips depend on the
+        filter settings, not just on the image.
+        """
         try:
             image = Image.open(io.BytesIO(image_blob))
-            text = pytesseract.image_to_string(image).strip()
-            return text
+            ocr_filter = TextExtractor.ocr_filter
+            if ocr_filter is not None:
+                reason = ocr_filter.skip_reason(image)
+                if reason is not None:
+                    return "", reason
+                image = ocr_filter.prepare(image)
+            return TextExtractor._image_to_string(image).strip(), "ocr_performed"
         except Exception as e:
             print(f"Error extracting text from image: {e}")
-            return None
+            return None, None
+
+    @staticmethod
+    def extract_text_from_image(image_blob):
+        digest = image_digest(image_blob)
+        if digest in TextExtractor.ocr_cache:
+            TextExtractor._count("ocr_cache_hits")
+            return TextExtractor.ocr_cache.get(digest)
+        text, outcome = TextExtractor.ocr_image(image_blob)
+        if text is not None:
+            TextExtractor._count(outcome)
+            if outcome == "ocr_performed":
+                TextExtractor.ocr_cache.put(digest, text)
+        return text
 
     @staticmethod
     def extract_all_text(ppt):
@@ -24,10 +270,3 @@ class TextExtractor:
                     text = shape.text_frame.text.strip()
                     all_text.append(text)
         return all_text
-    
-    
-        
-
-
-
-
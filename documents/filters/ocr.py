@@ -0,0 +1,78 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+from input_preprocessing.documents.filters.extract import TextExtractor, image_digest
+
+
+def _init_ocr_worker(ocr_cache_path=None):
+    """Load the OCR engine once per worker process."""
+    if ocr_cache_path:
+        TextExtractor.configure_ocr_cache(ocr_cache_path)
+    TextExtractor.use_persistent_engine()
+
+
+def _ocr_image(image_blob):
+    return TextExtractor.ocr_image(image_blob)
+
+
+def _read_image(image_path):
+    with open(image_path, "rb") as img_file:
+        return img_file.read()
+
+
+class OCRPool:
+    """
+    Bounded pool of long-lived OCR worker processes.
+
+    Jobs are submitted in batches (all images of a document or directory).
+    Identical images are OCRed once, results already in the OCR cache are
+    not sent to the workers at all, and results come back in job order.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, ocr_cache_path: Optional[str] = None,
+                 chunksize: int = 4):
+        self.max_workers = max_workers or multiprocessing.cpu_count()
+        self.ocr_cache_path = ocr_cache_path
+        self.chunksize = chunksize
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_ocr_worker,
+                initargs=(self.ocr_cache_path,),
+            )
+        return self._executor
+
+    def run(self, image_paths: List[str]) -> List[Optional[str]]:
+        """OCR a batch of image files and return their texts in order."""
+        cache = TextExtractor.ocr_cache
+        digests = []
+        pending = {}
+        for image_path in image_paths:
+            image_blob = _read_image(image_path)
+            digest = image_digest(image_blob)
+            digests.append(digest)
+            if digest in cache:
+                TextExtractor._count("ocr_cache_hits")
+            elif digest not in pending:
+                pending[digest] = image_blob
+
+        texts = {}
+        if pending:
+            results = self._get_executor().map(_ocr_image, pending.values(), chunksize=self.chunksize)
+            for digest, (text, outcome) in zip(pending.keys(), results):
+                if text is not None:
+                    TextExtractor._count(outcome)
+                    texts[digest] = text
+                    # Skips depend on the filter settings, so only real OCR output is cached
+                    if outcome == "ocr_performed":
+                        cache.put(digest, text)
+
+        return [texts[digest] if digest in texts else cache.get(digest) for digest in digests]
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -1,4 +1,3 @@
-from tqdm.auto import tqdm
 import shutil
 from input_preprocessing.documents.DocumentPreprocessing import *
 from input_preprocessing.documents.filters.extract import *
@@ -7,59 +6,63 @@ from input_preprocessing.documents.pdf.py_mupdf import *
 
 
 class PDFProcessor(DocumentProcessor):
-    def __init__(self, path: str, pdf_engine, output_path):
-        super().__init__(path, output_path)
+    doc_type = "pdf"
+
+    def __init__(self, path: str, pdf_engine, output_path, page_workers: int = 1, cache=None,
+                 ocr_pool=None, output_format: str = "json"):
+        super().__init__(path, output_path, cache, ocr_pool, output_format)
+        self.page_workers = page_workers
         self.pdf_engine = self._get_pdf_engine(pdf_engine)
 
     def _get_pdf_engine(self, engine_name: str):
         engines = {
-            'pymupdf': Pymupdf(),
+            'pymupdf': Pymupdf(workers=self.page_workers),
             'pdfplumber': PDFPlumber()
         }
-        return engines.get(engine_name.lower(),Pymupdf())
+        return engines.get(engine_name.lower(),Pymupdf(workers=self.page_workers))
+
+    def cache_config(self) -> Dict:
+        config = super().cache_config()
+        config["pdf_engine"] = type(self.pdf_engine).__name__
+        return config
 
     def extract_text_and_images(self,file_name=None) -> str:
         if file_name==None:
-            filename = os.path.join(self.folder_text_path, f"{self.folder_name}.json")
+            filename = self.output_filename()
 
         try:
             start_time = time.time()
 
-            # Get raw content using the selected PDF engine
-            raw_content = self.pdf_engine.extract_text_and_images(
-                self.path, self.folder_image_path
-            )
+            cached = self._cached_output()
+            if cached:
+                self.stats["processing_time"] = time.time() - start_time
+                return cached
 
-            processed_content=self._process_content(raw_content)
-
-            self.write_json_to_file(processed_content, filename)
+            self.write_pages(filename)
+            self._store_in_cache(filename)
 
             self.stats["processing_time"] = time.time() - start_time
             return filename
 
         except Exception as e:
             print(f"Error processing PDF: {e}")
+            self.error = e
             shutil.rmtree(self.folder_path, ignore_errors=True)
             return ""
 
-    def _collect_all_text(self, content: Dict) -> list:
-        texts = []
-        for page in content.get("pages", []):
-            for item in page.get("content", []):
-                if item.get("type") == "text":
-                    texts.append(item.get("text"))
-        return texts
-
-    def _process_content(self, content: Dict) -> Dict:
-        processed_content = {"type": "pdf", "pages": []}
+    def _raw_pages(self):
+        """Get raw pages from the selected PDF engine, streaming when it supports it."""
+        if hasattr(self.pdf_engine, "iter_pages"):
+            return self.pdf_engine.iter_pages(self.path, self.folder_image_path)
+        raw_content = self.pdf_engine.extract_text_and_images(self.path, self.folder_image_path)
+        return raw_content.get("pages", [])
 
-        for slide in content.get("pages", []):
+    def _iter_pages(self):
+        for slide in self._raw_pages():
             processed_slide = self._process_slide(slide)
-            if processed_slide["content"]:
-                processed_content["pages"].append(processed_slide)
             self.stats["total_pages"] += 1
-
-        return processed_content
+            if processed_slide["content"]:
+                yield processed_slide
 
     def _process_slide(self, slide: Dict) -> Dict:
         processed_slide = {"page_number": slide["page_number"], "content": []}
@@ -84,19 +87,9 @@ class PDFProcessor(DocumentProcessor):
     def _process_image_item(self, item: Dict, processed_slide: Dict) -> None:
         image_path = item.get("image_path")
         if image_path:
-            with open(image_path, "rb") as img_file:
-                image_blob = img_file.read()
-            ocr_text = TextExtractor.extract_text_from_image(image_blob)
-            if ocr_text:
-                processed_slide["content"].append({
-                    "type": "image",
-                    "image_path": image_path,
-                    "ocr_text": ocr_text
-                })
-                self.stats["total_ocr_text_blocks"] += 1
-            else:
-                processed_slide["content"].append({
-                    "type": "image",
-                    "image_path": image_path
-                })
-                self.stats["total_images_extracted"] += 1
+            content = {
+                "type": "image",
+                "image_path": image_path
+            }
+            processed_slide["content"].append(content)
+            self._queue_ocr(image_path, content)
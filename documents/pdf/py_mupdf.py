@@ -1,46 +1,117 @@
 import pymupdf
 import os
+from concurrent.futures import ProcessPoolExecutor
 from tqdm.auto import tqdm
+from input_preprocessing.documents.filters.extract import image_digest
 
-class Pymupdf:
-    def extract_text_and_images(self,pdf_path, output_dir):
 
-        pdf_document = pymupdf.open(pdf_path)
+def _extract_page_range(pdf_path, output_dir, start, stop):
+    """Extract pages [start, stop) with a dedicated pymupdf handle."""
+    pdf_document = pymupdf.open(pdf_path)
+    slides = []
+    written = {}
+    try:
+        for page_number in range(start, stop):
+            slides.append(Pymupdf._extract_page(pdf_document, page_number, output_dir, written))
+    finally:
+        pdf_document.close()
+    return slides
+
 
-        slides = []
+class Pymupdf:
+    def __init__(self, workers=1, min_pages_per_shard=50):
+        """
+        Args:
+            workers: Number of worker processes used to extract the pages of a
+                single document. With 1 the pages are walked serially.
+            min_pages_per_shard: Documents are only split into shards of at
+                least this many pages, so small files stay in-process.
+        """
+        self.workers = workers
+        self.min_pages_per_shard = min_pages_per_shard
 
-        for page_number in tqdm(range(len(pdf_document))):
-            page = pdf_document[page_number]
-            slide_content = []
+    @staticmethod
+    def _extract_page(pdf_document, page_number, output_dir, written):
+        """
+        Extract one page. ``written`` maps xrefs and image hashes to the files
+        already written for this document, so a logo repeated on every page
+        is stored on disk only once.
+        """
+        page = pdf_document[page_number]
+        slide_content = []
 
-            text = page.get_text("text")
-            if text.strip():
-                slide_content.append({"type": "text", "text": text.strip()})
+        text = page.get_text("text")
+        if text.strip():
+            slide_content.append({"type": "text", "text": text.strip()})
 
-            images = page.get_images(full=True)
-            for img_index, img in enumerate(images):
-                xref = img[0]
+        images = page.get_images(full=True)
+        for img_index, img in enumerate(images):
+            xref = img[0]
+            image_path = written.get(xref)
+            if image_path is None:
                 base_image = pdf_document.extract_image(xref)
                 image_bytes = base_image["image"]
                 image_ext = base_image["ext"]
+                digest = image_digest(image_bytes)
+                image_path = written.get(digest)
+                if image_path is None:
+                    image_filename = f"page{page_number + 1}_image{img_index + 1}.{image_ext}"
+                    image_path = os.path.join(output_dir, image_filename)
+                    with open(image_path, "wb") as img_file:
+                        img_file.write(image_bytes)
+                    written[digest] = image_path
+                written[xref] = image_path
 
-                image_filename = f"page{page_number + 1}_image{img_index + 1}.{image_ext}"
-                image_path = os.path.join(output_dir, image_filename)
-                with open(image_path, "wb") as img_file:
-                    img_file.write(image_bytes)
+            slide_content.append({
+                "type": "image",
+                "placeholder": f"[Image {img_index + 1}]",
+                "image_path": image_path
+            })
 
-                slide_content.append({
-                    "type": "image",
-                    "placeholder": f"[Image {img_index + 1}]",
-                    "image_path": image_path
-                })
+        return {
+            "page_number": page_number + 1,
+            "content": slide_content
+        }
 
-            slides.append({
-                "page_number": page_number + 1,
-                "content": slide_content
-            })
+    def _page_shards(self, page_count):
+        """Split [0, page_count) into contiguous ranges, one per worker."""
+        shard_count = min(self.workers, page_count // self.min_pages_per_shard)
+        if shard_count <= 1:
+            return [(0, page_count)]
+        size, remainder = divmod(page_count, shard_count)
+        shards = []
+        start = 0
+        for i in range(shard_count):
+            stop = start + size + (1 if i < remainder else 0)
+            shards.append((start, stop))
+            start = stop
+        return shards
 
-        pdf_document.close()
+    def iter_pages(self, pdf_path, output_dir):
+        """Yield page dicts in page order as they are extracted."""
+        pdf_document = pymupdf.open(pdf_path)
+        page_count = len(pdf_document)
+        shards = self._page_shards(page_count)
+
+        if len(shards) == 1:
+            written = {}
+            try:
+                for page_number in tqdm(range(page_count)):
+                    yield self._extract_page(pdf_document, page_number, output_dir, written)
+            finally:
+                pdf_document.close()
+        else:
+            pdf_document.close()
+            with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+                futures = [
+                    executor.submit(_extract_page_range, pdf_path, output_dir, start, stop)
+                    for start, stop in shards
+                ]
+                # Shards are contiguous, so merging in submission order keeps page order
+                for future in tqdm(futures):
+                    yield from future.result()
 
+    def extract_text_and_images(self,pdf_path, output_dir):
+        slides = list(self.iter_pages(pdf_path, output_dir))
         result = {"type": "pdf", "pages": slides}
         return result
@@ -6,30 +6,40 @@ from input_preprocessing.documents.filters.extract import *
 
 
 class PowerPointProcessor(DocumentProcessor):
+    doc_type = "ppt"
+
     def extract_text_and_images(self) -> str:
         try:
-            ppt = Presentation(self.path)
-            self.stats["total_pages"] = len(ppt.slides)
-            extracted_content = {"type": "ppt", "pages": []}
+            cached = self._cached_output()
+            if cached:
+                return cached
 
             start_time = time.time()
 
-            for slide_number, slide in enumerate(tqdm(ppt.slides), start=1):
-                slide_data = self._process_slide(slide, slide_number)
-                if slide_data["content"]:
-                    extracted_content["pages"].append(slide_data)
-
-            filename = os.path.join(self.folder_text_path, f"{self.folder_name}.json")
-            self.write_json_to_file(extracted_content, filename)
+            filename = self.output_filename()
+            self.write_pages(filename)
+            self._store_in_cache(filename)
 
             self.stats["processing_time"] = time.time() - start_time
             return filename
 
         except Exception as e:
             print(f"Error processing PowerPoint: {e}")
+            self.error = e
             shutil.rmtree(self.folder_path, ignore_errors=True)
             return ""
 
+    def _iter_pages(self):
+        ppt = Presentation(self.path)
+        self.stats["total_pages"] = len(ppt.slides)
+        # Image hash -> path, so repeated logos/backgrounds are written once
+        self._written_images = {}
+
+        for slide_number, slide in enumerate(tqdm(ppt.slides), start=1):
+            slide_data = self._process_slide(slide, slide_number)
+            if slide_data["content"]:
+                yield slide_data
+
     def _process_slide(self, slide, slide_number: int) -> Dict:
         slide_data = {"page_number": slide_number, "content": []}
 
@@ -50,19 +60,16 @@ class PowerPointProcessor(DocumentProcessor):
     def _process_image_shape(self, shape, slide_number: int, index: int, 
                            slide_data: Dict) -> None:
         image_data = shape.image.blob
-        ocr_text = TextExtractor.extract_text_from_image(image_data)
-
-        image_path = os.path.join(
-            self.folder_image_path, f"image_{slide_number}_{index}.png"
-        )
-        with open(image_path, 'wb') as f:
-            f.write(image_data)
+        digest = image_digest(image_data)
+        image_path = self._written_images.get(digest)
+        if image_path is None:
+            image_path = os.path.join(
+                self.folder_image_path, f"image_{slide_number}_{index}.png"
+            )
+            with open(image_path, 'wb') as f:
+                f.write(image_data)
+            self._written_images[digest] = image_path
 
         content = {"type": "image", "image_path": image_path}
-        if ocr_text:
-            content["ocr_text"] = ocr_text
-            self.stats["total_ocr_text_blocks"] += 1
-        else:
-            self.stats["total_images_extracted"] += 1
-
         slide_data["content"].append(content)
+        self._queue_ocr(image_path, content)
@@ -0,0 +1,104 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from input_preprocessing.documents.utils.preprocessor import InputPreprocessor
+from input_preprocessing.audio.app import Transcriber
+
+
+class AsyncInputPreprocessor:
+    """
+    Asyncio front-end for InputPreprocessor.
+
+    Every entry point runs the blocking work in an executor so the event loop
+    stays responsive, at most max_concurrency requests run at once, and each
+    call accepts an optional timeout in seconds. Cancelling a call (or hitting
+    its timeout) releases its slot immediately; work that has already started
+    in the executor runs to completion in the background.
+
+    Per-request state (audio files found, failed documents) is returned by
+    each call rather than kept on the preprocessor. Transcriptions on the
+    shared in-process model are serialized by the Transcriber; give the
+    preprocessor audio_workers > 1 to transcribe in parallel processes.
+    """
+
+    def __init__(self, preprocessor=None, max_concurrency=None, executor=None, audio_model=None):
+        self.preprocessor = preprocessor or InputPreprocessor()
+        self.max_concurrency = max_concurrency or multiprocessing.cpu_count()
+        self.executor = executor or ThreadPoolExecutor(max_workers=self.max_concurrency)
+        # None reuses the preprocessor's shared transcriber
+        self.audio_model = audio_model
+        self._transcriber = None
+        self._transcriber_lock = threading.Lock()
+        self._semaphore = None
+
+    def _get_semaphore(self):
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(self, func, *args, timeout=None, **kwargs):
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+            return await asyncio.wait_for(future, timeout)
+
+    async def preprocess_document(self, file_path, timeout=None):
+        """Process a single document and return its JSON file"""
+        return await self._run(self.preprocessor.preprocess_document, file_path, timeout=timeout)
+
+    async def chunk_document(self, file_path, strategy="merge", persist_json=False, timeout=None):
+        """Extract and chunk a single document"""
+        return await self._run(
+            self.preprocessor.chunk_document, file_path, strategy, persist_json, timeout=timeout
+        )
+
+    async def preprocess_directory(self, source_dir, parallel=True, max_workers=None, executor="thread",
+                                   timeout=None):
+        """Process all documents in a directory; returns (json_files, audio_files, failed_documents)"""
+        audio_files, failed_documents = [], {}
+        json_files = await self._run(
+            self.preprocessor.preprocess_directory, source_dir, parallel, max_workers, executor,
+            audio_files=audio_files, failed_documents=failed_documents, timeout=timeout,
+        )
+        return json_files, audio_files, failed_documents
+
+    async def chunk_documents(self, json_files, strategy="merge", parallel=True, max_workers=None, timeout=None):
+        """Chunk processed documents and return all chunks and images"""
+        return await self._run(
+            self.preprocessor.chunk_documents, json_files, strategy, parallel, max_workers, timeout=timeout
+        )
+
+    async def process_and_chunk_directory(self, source_dir, chunk_strategy="merge", parallel=True,
+                                          persist_json=True, timeout=None):
+        """Complete pipeline for a directory; returns (chunks, images, failed_documents)"""
+        failed_documents = {}
+        chunks, images = await self._run(
+            self.preprocessor.process_and_chunk_directory, source_dir, chunk_strategy, parallel,
+            persist_json=persist_json, failed_documents=failed_documents, timeout=timeout,
+        )
+        return chunks, images, failed_documents
+
+    def _get_transcriber(self):
+        if self.audio_model is None:
+            return self.preprocessor.transcriber
+        with self._transcriber_lock:
+            if self._transcriber is None:
+                self._transcriber = Transcriber(self.audio_model)
+            return self._transcriber
+
+    async def audio_to_sources(self, file_path, timeout=None):
+        """Transcribe an audio file and return its chunks and full transcript"""
+        def transcribe():
+            return self._get_transcriber().audio_to_sources(file_path)
+        return await self._run(transcribe, timeout=timeout)
+
+    async def chunk_audio(self, audio_files, timeout=None):
+        """Transcribe audio files, e.g. those returned by preprocess_directory"""
+        return await self._run(self.preprocessor.chunk_audio, audio_files, timeout=timeout)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+        self.preprocessor.shutdown()
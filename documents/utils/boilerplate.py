@@ -0,0 +1,140 @@
+import itertools
+import re
+import threading
+from collections import Counter
+
+_DIGITS = re.compile(r"\d+")
+# Decorated page numbers such as '- 12 -', 'Page 3', 'Slide 3 of 40' or 'p. 7/20'
+_PAGE_NUMBER = re.compile(
+    r"^(?:(?:page|slide|pg\.?|p\.)\s*\d+(?:\s*(?:/|of)\s*\d+)?|[-\u2013\u2014]\s*\d+\s*[-\u2013\u2014])$",
+    re.IGNORECASE,
+)
+_BARE_NUMBER = re.compile(r"^\d+$")
+
+
+def normalize_line(line, page=None):
+    """
+    Collapse whitespace, and mask the digits of page-number lines so 'Page 3'
+    and 'Page 14' count as one line. A bare number is only taken for a page
+    number when its page is given (for the first and last line of a page)
+    and is then keyed by its offset from the page, so '12' on page 12 and
+    '13' on page 13 repeat while integer table cells and years do not. Any
+    other bare number gets an empty key and is never boilerplate. Other
+    lines keep their digits: 'Step 1' and 'Step 2' are content, not
+    boilerplate.
+    """
+    line = " ".join(line.split())
+    if _PAGE_NUMBER.match(line):
+        return _DIGITS.sub("#", line)
+    if _BARE_NUMBER.match(line):
+        return "" if page is None else f"#page{int(line) - page:+d}"
+    return line
+
+
+def page_keys(lines, page=None):
+    """Normalized lines of one page; with its page number, its first and last lines may be page numbers."""
+    last = len(lines) - 1
+    return [normalize_line(line, page if i in (0, last) else None) for i, line in enumerate(lines)]
+
+
+class DocumentLines:
+    """
+    Repeated-line counter for a single document.
+
+    Lines are fed page by page with ``observe``; a normalized line becomes
+    boilerplate once it has been seen more than ``threshold`` times in the
+    document, or straight away if the corpus already knows it as boilerplate.
+    ``filter`` can therefore run on each page as it arrives, or after the
+    whole document has been observed for exact per-document results.
+    """
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.counts = Counter()
+        self.boilerplate = set()
+
+    def observe(self, lines, page=None):
+        self.observe_keys(page_keys(lines, page))
+
+    def observe_keys(self, keys):
+        threshold = self.detector.threshold
+        for key in keys:
+            if not key:
+                continue
+            self.counts[key] += 1
+            if self.counts[key] > threshold:
+                self.boilerplate.add(key)
+
+    def is_boilerplate(self, key):
+        return key in self.boilerplate or key in self.detector.corpus_boilerplate
+
+    def filter(self, lines, page=None):
+        return self.filter_keys(lines, page_keys(lines, page))
+
+    def filter_keys(self, lines, keys):
+        return [line for line, key in zip(lines, keys) if not self.is_boilerplate(key)]
+
+    def observe_and_filter(self, lines, page=None):
+        """Streaming mode: count a page and strip what is known to be boilerplate so far."""
+        keys = page_keys(lines, page)
+        self.observe_keys(keys)
+        return self.filter_keys(lines, keys)
+
+    def close(self):
+        """Fold this document's repeated lines into the corpus-level frequencies."""
+        # Lines seen once are almost always content; keeping them would grow
+        # the corpus counter with every distinct line of every document
+        self.detector._add_document([key for key, count in self.counts.items() if count > 1])
+
+
+class BoilerplateDetector:
+    """
+    Header/footer detection by counting normalized lines.
+
+    Each document gets its own DocumentLines counter. With min_documents set,
+    the detector also keeps corpus-level document frequencies of the lines
+    that repeat within a document, so a line repeated in at least
+    min_documents documents (e.g. the footer of a shared template) is
+    stripped from every later document, even where it appears only once.
+    One detector can be shared by the threads of a directory run.
+    """
+
+    def __init__(self, threshold=3, min_documents=None):
+        self.threshold = threshold
+        self.min_documents = min_documents
+        self.doc_freq = Counter()
+        self.corpus_boilerplate = frozenset()
+        self._lock = threading.Lock()
+
+    def document(self):
+        return DocumentLines(self)
+
+    def _add_document(self, keys):
+        if self.min_documents is None:
+            return
+        with self._lock:
+            self.doc_freq.update(keys)
+            new = {key for key in keys if self.doc_freq[key] >= self.min_documents}
+            if not new <= self.corpus_boilerplate:
+                # Swapped in whole so readers never see a set being resized
+                self.corpus_boilerplate = self.corpus_boilerplate | new
+
+    def strip(self, chunks):
+        """Remove boilerplate lines from a document's chunks in place."""
+        document = self.document()
+        chunk_lines = [chunk.text.splitlines() for chunk in chunks]
+        chunk_keys = []
+        # The chunks of a page are consecutive; its lines are normalized together so
+        # only the first and last line of the whole page can be a bare page number
+        for page, group in itertools.groupby(zip(chunks, chunk_lines), key=lambda pair: pair[0].start):
+            group_lines = [lines for _, lines in group]
+            keys = page_keys([line for lines in group_lines for line in lines], page)
+            document.observe_keys(keys)
+            for lines in group_lines:
+                chunk_keys.append(keys[:len(lines)])
+                keys = keys[len(lines):]
+        for chunk, lines, keys in zip(chunks, chunk_lines, chunk_keys):
+            chunk.text = " ".join(document.filter_keys(lines, keys))
+            chunk._token_count = None
+        document.close()
+        return chunks
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: only the in-process lock applies
+    fcntl = None
+
+
+CACHE_VERSION = 1
+
+
+@contextmanager
+def file_lock(lock_path: str, thread_lock: threading.Lock):
+    """
+    Hold thread_lock and an exclusive flock on lock_path, serializing a
+    read-modify-write of a shared file across threads and processes.
+    """
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class ExtractionCache:
+    """
+    Persistent, content-addressed cache of document extractions.
+
+    Entries are keyed by a hash of the input bytes plus the engine/config
+    used to extract them, so a re-upload of the same file under another name
+    reuses the JSON and images produced the first time. The index lives in
+    ``cache_dir/index.json`` and the cache is bounded by the total size of the
+    cached output folders; the least recently used entries are evicted first.
+    Index updates hold an exclusive lock on ``cache_dir/index.lock``, so the
+    cache can be shared by the workers of a process pool.
+
+    The cached folders are the live output folders handed back to callers,
+    so entries created or hit inside a ``run()`` block are never evicted
+    while it lasts; the cache may exceed max_bytes until the next put after.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 5 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = os.path.join(cache_dir, "index.lock")
+        self._lock = threading.Lock()
+        # Start times of the runs in progress, by run id; pickled along to worker processes
+        self._runs = {}
+        self._next_run = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(path: str, config: Dict) -> str:
+        """Hash the file contents together with the extraction config."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        digest.update(json.dumps({"version": CACHE_VERSION, **config}, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    @contextmanager
+    def run(self):
+        """Keep every entry stored or hit until the block exits safe from eviction."""
+        with self._lock:
+            run_id = self._next_run
+            self._next_run += 1
+            self._runs[run_id] = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                del self._runs[run_id]
+
+    def _locked(self):
+        return file_lock(self.lock_path, self._lock)
+
+    def _load_index(self) -> Dict:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _save_index(self, index: Dict) -> None:
+        # Write atomically so concurrent workers never observe a partial index
+        tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _folder_size(folder_path: str) -> int:
+        total = 0
+        for root, _, files in os.walk(folder_path):
+            for file in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, file))
+                except OSError:
+                    pass
+        return total
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached JSON path for a key, or None on a miss."""
+        with self._locked():
+            index = self._load_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if not os.path.isfile(entry["json_path"]):
+                # The output was removed behind our back
+                del index[key]
+                self._save_index(index)
+                return None
+            entry["last_access"] = time.time()
+            self._save_index(index)
+            return entry["json_path"]
+
+    def put(self, key: str, json_path: str, folder_path: str) -> None:
+        """Record a fresh extraction and evict old entries over the size budget."""
+        with self._locked():
+            index = self._load_index()
+            # A new extraction into the same folder overwrites older entries' output
+            for stale in [k for k, e in index.items() if e["folder_path"] == folder_path and k != key]:
+                del index[stale]
+            index[key] = {
+                "json_path": json_path,
+                "folder_path": folder_path,
+                "size": self._folder_size(folder_path),
+                "last_access": time.time(),
+            }
+            self._evict(index, keep=key)
+            self._save_index(index)
+
+    def _evict(self, index: Dict, keep: str) -> None:
+        # Entries used since the oldest run in progress started may still be read by it
+        protected_since = min(self._runs.values(), default=float("inf"))
+        total = sum(entry["size"] for entry in index.values())
+        for key in sorted(index, key=lambda k: index[k]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep or index[key]["last_access"] >= protected_since:
+                continue
+            entry = index.pop(key)
+            total -= entry["size"]
+            shutil.rmtree(entry["folder_path"], ignore_errors=True)
+
+    def clear(self) -> None:
+        with self._locked():
+            for entry in self._load_index().values():
+                shutil.rmtree(entry["folder_path"], ignore_errors=True)
+            self._save_index({})
@@ -1,11 +1,14 @@
 import json
 import os
+from functools import lru_cache
 from pathlib import Path
 import re
+import sys
 from typing import List, Union, Optional
-from nltk.tokenize import word_tokenize
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from input_preprocessing.documents.utils.retriever import Retriever
+from input_preprocessing.documents.utils.tokens import get_token_counter
+from input_preprocessing.documents.utils.boilerplate import BoilerplateDetector
 
 # Json utilities
 def add_text_to_json_format(text,slide):
@@ -36,15 +39,45 @@ def write_json_to_file(data, filename):
         print(f"An error occurred while writing JSON to file: {e}")
 
 
+@lru_cache(maxsize=None)
+def _slot_names(cls):
+    """All slots of a chunk class, base classes first."""
+    return tuple(name for klass in reversed(cls.__mro__) for name in klass.__dict__.get("__slots__", ()))
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _restore_chunk(cls, values):
+    """Unpickle a chunk from the flat tuple written by Chunk.__reduce__."""
+    chunk = cls.__new__(cls)
+    for name, value in zip(_slot_names(cls), values):
+        # Interned again so chunks from many workers share their source strings
+        setattr(chunk, name, _intern(value) if name in ("source", "type") else value)
+    return chunk
+
+
 class Chunk:
+    # No per-instance __dict__: large corpora hold millions of chunks
+    __slots__ = ("source", "type", "start", "end", "text", "_visited", "_token_count", "merged_sources")
 
     def __init__(self, source: str, type: str, start: int, end: int, text: str):
-        self.source = source
-        self.type = type
+        # Every chunk of a document repeats its path and type, so share one copy
+        self.source = _intern(source)
+        self.type = _intern(type)
         self.start = start
         self.end = end
         self.text = text
         self._visited = False
+        # Cached token count of text; reset whenever text changes
+        self._token_count = None
+        # (source, start, end) of duplicates collapsed into this chunk, if any
+        self.merged_sources = None
+
+    def __reduce__(self):
+        # A flat tuple of slot values pickles smaller than the default slot-name dict
+        return _restore_chunk, (type(self), tuple(getattr(self, name, None) for name in _slot_names(type(self))))
 
     def __str__(self):
         if self.start != self.end:
@@ -62,8 +95,11 @@ class Chunk:
             )
 
     @staticmethod
-    def merge_chunks(chunk1: 'Chunk', chunk2: 'Chunk') -> 'Chunk':
-        """Merge two chunks, handling page ranges appropriately."""
+    def merge_chunks(chunk1: 'Chunk', chunk2: 'Chunk', additive: bool = False) -> 'Chunk':
+        """
+        Merge two chunks, handling page ranges appropriately. Pass additive=True
+        (TokenCounter.additive) to carry over the sum of their cached token counts.
+        """
         if chunk1.source != chunk2.source:
             raise ValueError("Cannot merge chunks from different sources")
 
@@ -72,104 +108,154 @@ class Chunk:
 
         merged_text = f"{chunk1.text} {chunk2.text}".strip()
 
-        return Chunk(
+        merged = Chunk(
             source=chunk1.source,
             type=chunk1.type,
             start=merged_start,
             end=merged_end,
             text=merged_text,
         )
+        # Only valid for engines whose tokens never span the joining space; others
+        # (e.g. word_tokenize) may split the joined text differently
+        count1 = getattr(chunk1, "_token_count", None)
+        count2 = getattr(chunk2, "_token_count", None)
+        if additive and count1 is not None and count2 is not None:
+            merged._token_count = count1 + count2
+        return merged
 
 
 class Chunker:
 
-    def __init__(self, min_chunk_tokens: int = 200):
+    def __init__(self, min_chunk_tokens: int = 200, embedding_cache=None, vector_index=None, topic_model=None,
+                 token_counter="regex", max_chunk_tokens=None, boilerplate=None, deduplicator=None):
         self.min_chunk_tokens = min_chunk_tokens
+        # Optional upper bound on merged chunk size for the 'merge' strategy
+        self.max_chunk_tokens = max_chunk_tokens
+        # 'regex' (fast) or 'nltk' (word_tokenize), or a TokenCounter instance
+        self.token_counter = get_token_counter(token_counter)
+        # Optional EmbeddingCache shared by every Retriever this chunker builds
+        self.embedding_cache = embedding_cache
+        # Optional VectorIndex that accumulates every chunked document
+        self.vector_index = vector_index
+        # Optional TopicModel keeping corpus-level term frequencies across documents
+        self.topic_model = topic_model
+        # Repeated-line detector; share one with min_documents set to learn templates across a corpus
+        self.boilerplate = boilerplate or BoilerplateDetector()
+        # Optional ChunkDeduplicator run before embedding on every document; it remembers
+        # every chunk it has seen, so prefer passing a per-run one to chunk()/chunk_pages()
+        self.deduplicator = deduplicator
+
+    @staticmethod
+    def _iter_pages(file_path):
+        """
+        Yields (document type, page) pairs from a preprocessed file. JSON Lines
+        files are read one page at a time; plain JSON is loaded whole.
+        """
+        with open(file_path, 'r', encoding='utf-8') as f:
+            if file_path.endswith('.jsonl'):
+                doc_type = json.loads(f.readline())["type"]
+                for line in f:
+                    if line.strip():
+                        yield doc_type, json.loads(line)
+            else:
+                data = json.load(f)
+                for page in data['pages']:
+                    yield data["type"], page
 
     @staticmethod
     def _json_to_chunks_and_images(file_path):
         """Parses the preprocessed JSON file and extracts text chunks and images from pages."""
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-            chunks = []
-            images = []
-            for page in data['pages']:
-                for content in page['content']:
-                    if content['type'] == 'text':
-                        stripped = content["text"].strip()
-                        if stripped:
-                            chunks.append(
-                                Chunk(
-                                    source=file_path,
-                                    type=data["type"],
-                                    start=page["page_number"],
-                                    end=page["page_number"],
-                                    text=stripped,
-                                )
+        return Chunker._pages_to_chunks_and_images(file_path, Chunker._iter_pages(file_path))
+
+    @staticmethod
+    def _pages_to_chunks_and_images(file_path, pages):
+        """Extracts text chunks and images from (document type, page) pairs."""
+        chunks = []
+        images = []
+        for doc_type, page in pages:
+            for content in page['content']:
+                if content['type'] == 'text':
+                    stripped = content["text"].strip()
+                    if stripped:
+                        chunks.append(
+                            Chunk(
+                                source=file_path,
+                                type=doc_type,
+                                start=page["page_number"],
+                                end=page["page_number"],
+                                text=stripped,
                             )
-                    elif content['type'] == 'image':
-                        # if 'ocr_text' in content:
-                        #     stripped = content['ocr_text'].strip()
-                        #     if stripped:
-                        #         chunks.append(
-                        #             Chunk(
-                        #                 source=file_path,
-                        #                 type=data["type"],
-                        #                 start=page["page_number"],
-                        #                 end=page["page_number"],
-                        #                 text=stripped,
-                        #             )
-                        #         )
-                        if 'image_path' in content:
-                            images.append(
-                                ImageSource(
-                                    source=file_path,
-                                    type=data["type"],
-                                    loc=page["page_number"],
-                                    file_path=content["image_path"],
-                                )
+                        )
+                elif content['type'] == 'image':
+                    # if 'ocr_text' in content:
+                    #     stripped = content['ocr_text'].strip()
+                    #     if stripped:
+                    #         chunks.append(
+                    #             Chunk(
+                    #                 source=file_path,
+                    #                 type=doc_type,
+                    #                 start=page["page_number"],
+                    #                 end=page["page_number"],
+                    #                 text=stripped,
+                    #             )
+                    #         )
+                    if 'image_path' in content:
+                        images.append(
+                            ImageSource(
+                                source=file_path,
+                                type=doc_type,
+                                loc=page["page_number"],
+                                file_path=content["image_path"],
                             )
-            return chunks, images
-
-    def _chunk_to_lines(self, chunk: Chunk):
-        text = chunk.text
-        lines = text.splitlines()
-        return lines
-
-    def _remove_lines(self, chunk: Chunk, lines_to_remove: List[str]):
-        lines = self._chunk_to_lines(chunk)
-        filtered_lines = [line for line in lines if line not in lines_to_remove]
-        chunk.text = " ".join(filtered_lines)
-        return chunk
-
-    def _get_bad_lines(self, lines: List[str], threshold=3):
-        line_counts = {}
-        for line in lines:
-            line = line.strip()
-            if line in line_counts:
-                line_counts[line] += 1
-            else:
-                line_counts[line] = 1
-        bad_lines = [line for line, count in line_counts.items() if count > threshold]
-        return bad_lines
+                        )
+        return chunks, images
 
     def _preprocess_chunks(self, chunks: List[Chunk]):
-        all_lines = []
-        for chunk in chunks:
-            all_lines.extend(self._chunk_to_lines(chunk))
-        bad_lines = self._get_bad_lines(all_lines)
-        for chunk in chunks:
-            self._remove_lines(chunk, bad_lines)
-        return chunks
+        """Strip repeated header/footer lines from a document's chunks."""
+        return self.boilerplate.strip(chunks)
 
-    def chunk(self, filename, strategy="merge", rag=True):
+    def chunk(self, filename, strategy="merge", rag=True, deduplicator=None):
         chunks, images = self._json_to_chunks_and_images(filename)
+        return self._chunk_extracted(chunks, images, strategy, rag, deduplicator)
+
+    def chunk_pages(self, source, doc_type, pages, strategy="merge", rag=True, deduplicator=None):
+        """
+        Chunk pages handed over in-process by a document processor, without
+        going through a JSON file on disk.
+
+        Args:
+            source: Path recorded as the source of every chunk and image
+            doc_type: Document type of the pages ('pdf' or 'ppt')
+            pages: Iterable of page dicts, e.g. DocumentProcessor.iter_pages()
+            deduplicator: ChunkDeduplicator for this call, e.g. one shared by
+                the documents of a directory run; defaults to self.deduplicator
+        """
+        chunks, images = self._pages_to_chunks_and_images(
+            source, ((doc_type, page) for page in pages)
+        )
+        return self._chunk_extracted(chunks, images, strategy, rag, deduplicator)
+
+    def _chunk_extracted(self, chunks, images, strategy, rag, deduplicator=None):
         chunks=self._preprocess_chunks(chunks)
         chunks = self._rechunk(chunks, strategy)
+        deduplicator = deduplicator or self.deduplicator
+        if deduplicator is not None:
+            chunks = deduplicator.deduplicate(chunks)
         if rag==True:
-            chunks = Retriever(chunks).extract_key_chunks()
+            chunks = self.select_key_chunks(chunks)
         return chunks, images
 
+    def select_key_chunks(self, chunks, embeddings=None, search_index=False):
+        """
+        Keep the chunks most relevant to the document's key topics. With
+        search_index=True, e.g. for a whole corpus, the topics are looked up
+        through the vector index, if one is configured.
+        """
+        return Retriever(
+            chunks, embedding_cache=self.embedding_cache, embeddings=embeddings, index=self.vector_index,
+            topic_model=self.topic_model, search_index=search_index,
+        ).extract_key_chunks()
+
     def _rechunk(self, chunk_list, strategy='none', **kwargs):
         """
         Higher-order function that returns the appropriate chunking function based on strategy.
@@ -183,6 +269,7 @@ class Chunker:
                 - chunk_size: Size of chunks for recursive strategy
                 - chunk_overlap: Overlap size for recursive strategy
                 - separators: List of separators for recursive strategy
+                - max_chunk_tokens: Maximum merged chunk size for merge strategy
         
         Returns:
             Function that implements the requested chunking strategy
@@ -199,7 +286,10 @@ class Chunker:
                 window_size=kwargs.get('window_size', 100),
                 overlap=kwargs.get('overlap', 50)
             ),
-            'merge': lambda chunks: self.merge_small_chunks(chunks),
+            'merge': lambda chunks: self.merge_small_chunks(
+                chunks,
+                max_chunk_tokens=kwargs.get('max_chunk_tokens', None)
+            ),
             'recursive': lambda chunks: self.split_recursive(
                 chunks,
                 chunk_size=kwargs.get('chunk_size', 1000),
@@ -214,10 +304,15 @@ class Chunker:
 
         return strategies[strategy](chunk_list)
 
+    def _count_tokens(self, chunk: Chunk) -> int:
+        """Token count of a chunk, cached on the chunk."""
+        if getattr(chunk, "_token_count", None) is None:
+            chunk._token_count = self.token_counter.count(chunk.text.strip())
+        return chunk._token_count
+
     def _validate_chunk(self, chunk: Chunk) -> bool:
         """Validates if a chunk meets the minimum token threshold."""
-        tokens = word_tokenize(chunk.text.strip())
-        return len(tokens) >= self.min_chunk_tokens
+        return self._count_tokens(chunk) >= self.min_chunk_tokens
 
     def split_by_sentence(self, chunks: List[Chunk]) -> List[Chunk]:
         """Split each chunk into sentence-level chunks."""
@@ -238,9 +333,9 @@ class Chunker:
         """Split chunks into fixed-size token windows."""
         result = []
         for chunk in chunks:
-            text = word_tokenize(chunk.text.strip())
+            text = self.token_counter.tokenize(chunk.text.strip())
             for i in range(0, len(text), window_size):
-                window = text[i:i + window_size]
+                window = " ".join(text[i:i + window_size])
                 if window:
                     new_chunk = Chunk(
                         chunk.source, chunk.type, chunk.start, chunk.end, window
@@ -260,9 +355,9 @@ class Chunker:
 
         result = []
         for chunk in chunks:
-            text = word_tokenize(chunk.text.strip())
+            text = self.token_counter.tokenize(chunk.text.strip())
             for i in range(0, len(text), step):
-                window = text[i:i + window_size].strip()
+                window = " ".join(text[i:i + window_size]).strip()
                 if window:
                     new_chunk = Chunk(
                         chunk.source, chunk.type, chunk.start, chunk.end, window
@@ -271,28 +366,56 @@ class Chunker:
                         result.append(new_chunk)
         return result
 
-    def merge_small_chunks(self, chunks: List[Chunk]) -> List[Chunk]:
-        """Merge consecutive small chunks until they meet the token threshold."""
-        if not chunks:
-            return []
+    def merge_small_chunks(self, chunks: List[Chunk], max_chunk_tokens: Optional[int] = None) -> List[Chunk]:
+        """
+        Merge consecutive small chunks until they meet the token threshold.
+
+        Runs in one linear pass: the texts of the pending run are collected in
+        a list with a running token total, and a merged Chunk is only built
+        once the run reaches min_chunk_tokens. A pending run is therefore
+        always under the threshold, and one that can no longer grow is
+        dropped, like chunks under the threshold in the other strategies:
+        at the end of a source, and, if max_chunk_tokens is set, when the
+        next chunk would push it past the maximum. A single chunk over the
+        maximum is kept whole. With a non-additive token counter the running
+        total is an estimate and the merged chunk is counted afresh when
+        next needed.
+        """
+        if max_chunk_tokens is None:
+            max_chunk_tokens = self.max_chunk_tokens
 
         result = []
-        current = chunks[0]
-
-        for next_chunk in chunks[1:]:
-            if self._validate_chunk(current):
-                result.append(current)
-                current = next_chunk
+        parts = []
+        total = 0
+        first = None
+        start = end = None
+
+        def materialize():
+            if len(parts) == 1:
+                return first
+            merged = Chunk(first.source, first.type, start, end, " ".join(parts).strip())
+            if self.token_counter.additive:
+                merged._token_count = total
+            return merged
 
-            merged = Chunk.merge_chunks(current, next_chunk)
-            if self._validate_chunk(merged):
-                result.append(current)
-                current = next_chunk
+        for chunk in chunks:
+            count = self._count_tokens(chunk)
+            if parts and (
+                chunk.source != first.source
+                or max_chunk_tokens is not None and total + count > max_chunk_tokens
+            ):
+                parts, total = [], 0
+
+            if not parts:
+                first, start, end = chunk, chunk.start, chunk.end
             else:
-                current = merged
+                start, end = min(start, chunk.start), max(end, chunk.end)
+            parts.append(chunk.text)
+            total += count
 
-        if self._validate_chunk(current):
-            result.append(current)
+            if total >= self.min_chunk_tokens:
+                result.append(materialize())
+                parts, total = [], 0
 
         return result
 
@@ -348,9 +471,10 @@ class Chunker:
 
 
 class ImageSource(Chunk):
+    __slots__ = ("loc", "file_path")
+
     def __init__(self, source, type, loc, file_path):
-        self.source = source
-        self.type = type
+        super().__init__(source, type, loc, loc, "")
         self.loc = loc  # page or slide
         self.file_path = file_path
 
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+import zlib
+import numpy as np
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+class ChunkDeduplicator:
+    """
+    Drops exact and near-duplicate chunks before they are embedded.
+
+    Identical texts (after whitespace and case normalization) are caught by a
+    SHA-1 of the text. Near duplicates are found with MinHash signatures over
+    word shingles and an LSH index of num_perm / bands rows per band; a
+    candidate counts as a duplicate when its estimated Jaccard similarity is
+    at least ``threshold``. The first chunk seen is kept and records the
+    (source, start, end) of every chunk merged into it in ``merged_sources``.
+
+    One deduplicator can be shared by every document of a directory run to
+    collapse duplicates across files; it is thread-safe, but with parallel
+    chunking which copy is kept depends on completion order. It remembers
+    every chunk it keeps, so use one per run (or ``reset`` it): chunking the
+    same documents again through it would drop every chunk.
+    """
+
+    def __init__(self, threshold=0.8, num_perm=128, bands=32, shingle_size=5, seed=0):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # a * x + b stays below 2**64 for 32-bit shingle hashes, so nothing wraps
+        self._a = rng.integers(1, 1 << 32, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget every chunk seen so far."""
+        with self._lock:
+            self._exact = {}
+            self._buckets = {}
+            self._kept = []
+            self._signatures = []
+            self.stats = {"exact": 0, "near": 0, "kept": 0}
+
+    @staticmethod
+    def _normalize(text):
+        return " ".join(text.lower().split())
+
+    def _shingle_hashes(self, text):
+        words = text.split()
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+    def signature(self, text):
+        """MinHash signature of a text as num_perm uint32 values."""
+        hashes = self._shingle_hashes(self._normalize(text))
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    def _find_near_duplicate(self, signature, band_keys):
+        seen = set()
+        for key in band_keys:
+            for candidate in self._buckets.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if np.mean(self._signatures[candidate] == signature) >= self.threshold:
+                    return candidate
+        return None
+
+    @staticmethod
+    def _record_duplicate(kept, duplicate):
+        if kept.merged_sources is None:
+            kept.merged_sources = []
+        kept.merged_sources.append((duplicate.source, duplicate.start, duplicate.end))
+        if duplicate.merged_sources:
+            kept.merged_sources.extend(duplicate.merged_sources)
+
+    def deduplicate(self, chunks):
+        """Return chunks without the duplicates of chunks seen earlier, in their original order."""
+        result = []
+        for chunk in chunks:
+            digest = hashlib.sha1(self._normalize(chunk.text).encode("utf-8")).digest()
+            with self._lock:
+                kept = self._exact.get(digest)
+                if kept is not None:
+                    self.stats["exact"] += 1
+                    self._record_duplicate(kept, chunk)
+                    continue
+            # The signature is computed outside the lock
+            signature = self.signature(chunk.text)
+            band_keys = self._band_keys(signature)
+            with self._lock:
+                # Another thread may have stored the same text in the meantime
+                kept = self._exact.get(digest)
+                if kept is None:
+                    candidate = self._find_near_duplicate(signature, band_keys)
+                    if candidate is not None:
+                        kept = self._kept[candidate]
+                        self.stats["near"] += 1
+                else:
+                    self.stats["exact"] += 1
+                if kept is not None:
+                    self._record_duplicate(kept, chunk)
+                    continue
+                index = len(self._kept)
+                self._kept.append(chunk)
+                self._signatures.append(signature)
+                self._exact[digest] = chunk
+                for key in band_keys:
+                    self._buckets.setdefault(key, []).append(index)
+                self.stats["kept"] += 1
+            result.append(chunk)
+        return result
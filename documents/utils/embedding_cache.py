@@ -0,0 +1,127 @@
+import hashlib
+import heapq
+import json
+import os
+import re
+import threading
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Persistent chunk-embedding cache keyed by model name and text hash.
+
+    Vectors live in a fixed-capacity memory-mapped ``.npy`` file, one slot per
+    cached text, so only the rows that are actually read are paged in. The
+    key -> slot map and the last-use counters are kept in ``index.json`` next
+    to it. When the cache is full the least recently used slots are reused.
+    The cache is meant to have one writing process at a time.
+    """
+
+    def __init__(self, cache_dir, model_name, capacity=200_000):
+        self.model_name = model_name
+        self.capacity = capacity
+        self.cache_dir = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", model_name))
+        self.vectors_path = os.path.join(self.cache_dir, "vectors.npy")
+        self.index_path = os.path.join(self.cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._slots = {}
+        self._last_used = {}
+        self._tick = 0
+        # Slots below this mark are all occupied; evicted slots are reused at once
+        self._next_slot = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if not os.path.isfile(self.vectors_path):
+            return
+        self._vectors = np.load(self.vectors_path, mmap_mode="r+")
+        self.capacity = self._vectors.shape[0]
+        self._slots = index["slots"]
+        self._last_used = index["last_used"]
+        self._tick = index["tick"]
+        self._next_slot = index["next_slot"]
+
+    def _open_vectors(self, dim):
+        self._vectors = np.lib.format.open_memmap(
+            self.vectors_path, mode="w+", dtype=np.float32, shape=(self.capacity, dim)
+        )
+
+    @staticmethod
+    def normalize(text):
+        return " ".join(text.split())
+
+    @classmethod
+    def key(cls, text):
+        return hashlib.sha1(cls.normalize(text).encode("utf-8")).hexdigest()
+
+    def _allocate(self, count):
+        """Return count free slots, evicting the least recently used entries if needed."""
+        free = list(range(self._next_slot, min(self.capacity, self._next_slot + count)))
+        self._next_slot += len(free)
+        missing = count - len(free)
+        if missing > 0:
+            for key in heapq.nsmallest(missing, self._last_used, key=self._last_used.get):
+                free.append(self._slots.pop(key))
+                del self._last_used[key]
+        return free
+
+    def encode(self, encoder, texts, **kwargs):
+        """Embed texts, running the encoder only on cache misses."""
+        if not texts:
+            return encoder.encode(texts, **kwargs)
+        keys = [self.key(text) for text in texts]
+        vectors = {}
+        misses = {}
+        with self._lock:
+            self._tick += 1
+            tick = self._tick
+            for key, text in zip(keys, texts):
+                if key in vectors or key in misses:
+                    continue
+                slot = self._slots.get(key)
+                if slot is None:
+                    misses[key] = text
+                else:
+                    vectors[key] = np.array(self._vectors[slot])
+                    self._last_used[key] = tick
+
+        if misses:
+            # The encoder runs outside the lock so threads sharing the cache embed concurrently
+            encoded = np.asarray(encoder.encode(list(misses.values()), **kwargs), dtype=np.float32)
+            vectors.update(zip(misses.keys(), encoded))
+            with self._lock:
+                if self._vectors is None:
+                    self._open_vectors(encoded.shape[1])
+                # Another thread may have stored some of the same texts in the meantime;
+                # a batch larger than the cache only stores what fits
+                storable = [key for key in misses if key not in self._slots][:self.capacity]
+                for key, slot in zip(storable, self._allocate(len(storable))):
+                    self._vectors[slot] = vectors[key]
+                    self._slots[key] = slot
+                    self._last_used[key] = tick
+
+        return np.stack([vectors[key] for key in keys])
+
+    def flush(self):
+        """Persist the vectors and the index."""
+        with self._lock:
+            if self._vectors is None:
+                return
+            self._vectors.flush()
+            tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "slots": self._slots,
+                    "last_used": self._last_used,
+                    "tick": self._tick,
+                    "next_slot": self._next_slot,
+                }, f)
+            os.replace(tmp_path, self.index_path)
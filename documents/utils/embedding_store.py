@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import numpy as np
+
+
+QUANTIZATIONS = (None, "float16", "int8")
+
+
+class EmbeddingStore:
+    """
+    Memory-mapped embedding storage with an optional quantized copy.
+
+    Full-precision vectors are kept in ``vectors.npy``. With quantization
+    'float16' or 'int8' a compact copy is kept next to them (int8 uses one
+    symmetric scale per row) and similarity scoring runs on that copy, which
+    is 2-4x smaller. Only the best candidates are rescored in full precision.
+    Files grow by doubling their capacity; ``meta.json`` records how many
+    rows are in use. Opened with mode='r', a store can be shared read-only by
+    any number of worker processes.
+    """
+
+    def __init__(self, path, dim=None, quantization="int8", mode="r+", initial_capacity=1024):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}. "
+                             f"Available quantizations: {', '.join(str(q) for q in QUANTIZATIONS)}")
+        self.path = path
+        self.mode = mode
+        self.initial_capacity = initial_capacity
+        self.meta_path = os.path.join(path, "meta.json")
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._quantized = None
+        self._scales = None
+        self.count = 0
+        self.dim = dim
+        self.quantization = quantization
+        if os.path.isfile(self.meta_path):
+            self._open()
+        elif mode == "r":
+            raise FileNotFoundError(f"No embedding store at {path}")
+        else:
+            os.makedirs(path, exist_ok=True)
+
+    def __len__(self):
+        return self.count
+
+    def _file(self, name):
+        return os.path.join(self.path, f"{name}.npy")
+
+    def _open(self):
+        with open(self.meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        self.quantization = meta["quantization"]
+        self._vectors = np.load(self._file("vectors"), mmap_mode=self.mode)
+        if self.quantization is not None:
+            self._quantized = np.load(self._file("quantized"), mmap_mode=self.mode)
+        if self.quantization == "int8":
+            self._scales = np.load(self._file("scales"), mmap_mode=self.mode)
+
+    def _grow(self, capacity):
+        """Reallocate the memory-mapped files with a larger capacity."""
+        def resized(name, old, shape, dtype):
+            new_path = self._file(name) + ".tmp"
+            new = np.lib.format.open_memmap(new_path, mode="w+", dtype=dtype, shape=shape)
+            if old is not None and self.count:
+                new[:self.count] = old[:self.count]
+            new.flush()
+            del new
+            os.replace(new_path, self._file(name))
+            return np.load(self._file(name), mmap_mode="r+")
+
+        self._vectors = resized("vectors", self._vectors, (capacity, self.dim), np.float32)
+        if self.quantization == "float16":
+            self._quantized = resized("quantized", self._quantized, (capacity, self.dim), np.float16)
+        elif self.quantization == "int8":
+            self._quantized = resized("quantized", self._quantized, (capacity, self.dim), np.int8)
+            self._scales = resized("scales", self._scales, (capacity,), np.float32)
+
+    @staticmethod
+    def quantize_int8(vectors):
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def append(self, vectors):
+        """Append vectors and return their row ids."""
+        if self.mode == "r":
+            raise PermissionError("Embedding store was opened read-only")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            start, stop = self.count, self.count + len(vectors)
+            capacity = 0 if self._vectors is None else len(self._vectors)
+            if stop > capacity:
+                self._grow(max(stop, 2 * capacity, self.initial_capacity))
+            self._vectors[start:stop] = vectors
+            if self.quantization == "float16":
+                self._quantized[start:stop] = vectors.astype(np.float16)
+            elif self.quantization == "int8":
+                self._quantized[start:stop], self._scales[start:stop] = self.quantize_int8(vectors)
+            self.count = stop
+        return np.arange(start, stop)
+
+    def vectors(self, start=0, stop=None):
+        """Full-precision rows, as a view on the memory-mapped file."""
+        stop = self.count if stop is None else stop
+        return self._vectors[start:stop]
+
+    def approximate_scores(self, query, block_size=65536):
+        """Inner products computed on the quantized copy (or full precision without one)."""
+        query = np.asarray(query, dtype=np.float32)
+        source = self._vectors if self.quantization is None else self._quantized
+        scores = np.empty(self.count, dtype=np.float32)
+        # Work block by block so only one block is ever widened to float32
+        for start in range(0, self.count, block_size):
+            stop = min(start + block_size, self.count)
+            scores[start:stop] = np.dot(source[start:stop].astype(np.float32), query)
+        if self.quantization == "int8":
+            scores *= self._scales[:self.count]
+        return scores
+
+    def exact_scores(self, ids, query):
+        return np.dot(self._vectors[ids], np.asarray(query, dtype=np.float32))
+
+    def flush(self):
+        if self.mode == "r" or self._vectors is None:
+            return
+        with self._lock:
+            for array in (self._vectors, self._quantized, self._scales):
+                if array is not None:
+                    array.flush()
+            tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"count": self.count, "dim": self.dim, "quantization": self.quantization}, f)
+            os.replace(tmp_path, self.meta_path)
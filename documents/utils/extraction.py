@@ -0,0 +1,45 @@
+import os
+from input_preprocessing.documents.powerpoint.powerpoint_preprocessing import PowerPointProcessor
+from input_preprocessing.documents.pdf.pdf_preprocessing import PDFProcessor
+from input_preprocessing.documents.filters.extract import TextExtractor
+
+# Entry points for extraction worker processes. This module only imports the
+# extraction dependencies, so workers never load the embedding or audio models.
+
+
+def build_processor(file_path, json_path, page_workers=1, cache=None, ocr_pool=None, output_format="json"):
+    """Create the appropriate document processor for a file"""
+    file_extension = os.path.splitext(file_path)[1].lower()
+    if file_extension == '.pptx':
+        return PowerPointProcessor(
+            file_path, json_path, cache=cache, ocr_pool=ocr_pool, output_format=output_format
+        )
+    elif file_extension == '.pdf':
+        return PDFProcessor(
+            file_path, "pymupdf", json_path, page_workers=page_workers, cache=cache, ocr_pool=ocr_pool,
+            output_format=output_format,
+        )
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+
+
+def run_processor(processor):
+    """Extract a document and return its JSON file, raising the error that stopped the extraction"""
+    json_file = processor.extract_text_and_images()
+    if not json_file:
+        if processor.error is not None:
+            raise processor.error
+        raise RuntimeError(f"Extraction produced no output for {processor.path}")
+    return json_file
+
+
+def init_extraction_worker(ocr_cache_path=None):
+    """Set up a worker process once: open the shared OCR cache and keep one tesseract engine loaded"""
+    if ocr_cache_path:
+        TextExtractor.configure_ocr_cache(ocr_cache_path)
+    TextExtractor.use_persistent_engine()
+
+
+def extract_document(file_path, json_path, page_workers=1, cache=None, output_format="json"):
+    """Run a document extraction inside a worker process"""
+    return run_processor(build_processor(file_path, json_path, page_workers, cache, output_format=output_format))
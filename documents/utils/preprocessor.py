@@ -1,43 +1,159 @@
 # input-preprocessing/api.py
 import os
 import multiprocessing
-from concurrent.futures import ThreadPoolExecutor
-from input_preprocessing.documents.powerpoint.powerpoint_preprocessing import PowerPointProcessor
-from input_preprocessing.documents.pdf.pdf_preprocessing import PDFProcessor
+import shutil
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from input_preprocessing.documents.utils.core import Chunker, ImageSource
-from input_preprocessing.audio.app import AudioChunk, Transcriber
+from input_preprocessing.documents.utils.cache import ExtractionCache
+from input_preprocessing.documents.utils.extraction import (
+    build_processor, run_processor, init_extraction_worker, extract_document,
+)
+from input_preprocessing.documents.utils import retriever
+from input_preprocessing.documents.utils.embedding_cache import EmbeddingCache
+from input_preprocessing.documents.utils.topics import TopicModel
+from input_preprocessing.documents.utils.boilerplate import BoilerplateDetector
+from input_preprocessing.documents.utils.dedup import ChunkDeduplicator
+from input_preprocessing.documents.filters.extract import TextExtractor
+from input_preprocessing.documents.filters.ocr import OCRPool
+from input_preprocessing.audio.app import AudioChunk, Transcriber, TranscriberPool
+from input_preprocessing.audio.vad import EnergyVAD
+
 
 class InputPreprocessor:
-    def __init__(self, output_dir="data/"):
+    def __init__(self, output_dir="data/", page_workers=1, cache_dir=None, cache_max_bytes=5 * 1024 ** 3,
+                 ocr_cache_path=None, ocr_workers=None, output_format="json", embedding_cache_dir=None,
+                 vector_index=None, topic_model_path=None, boilerplate_min_documents=None,
+                 dedup_threshold=None, dedup_across_calls=False, audio_model="base", audio_workers=1, audio_memory_budget=None,
+                 audio_vad=False):
         self.output_dir = output_dir
+        # 'json' for a single document per file, 'jsonl' for one record per page
+        self.output_format = output_format
+        # Worker processes used to shard the pages of a single large PDF
+        self.page_workers = page_workers
+        # Content-addressed cache so re-uploads skip extraction entirely
+        self.cache = ExtractionCache(cache_dir, cache_max_bytes) if cache_dir else None
+        # Optional file that persists OCR results across runs
+        self.ocr_cache_path = ocr_cache_path
+        if ocr_cache_path:
+            TextExtractor.configure_ocr_cache(ocr_cache_path)
+        # Shared pool of long-lived OCR workers; without it OCR runs inline
+        self.ocr_pool = OCRPool(ocr_workers, ocr_cache_path) if ocr_workers else None
         self.json_path = os.path.join(output_dir, "json/")
-        self.chunker = Chunker(min_chunk_tokens=100)
+        # Persistent chunk embeddings so re-chunking never re-encodes known text
+        embedding_cache = (
+            EmbeddingCache(embedding_cache_dir, retriever.DEFAULT_ENCODER) if embedding_cache_dir else None
+        )
+        # Corpus-wide topic model persisted across runs
+        topic_model = TopicModel(topic_model_path) if topic_model_path else None
+        self.chunker = Chunker(
+            min_chunk_tokens=100, embedding_cache=embedding_cache, vector_index=vector_index,
+            topic_model=topic_model,
+            # Lines found in this many documents are treated as template boilerplate everywhere
+            boilerplate=BoilerplateDetector(min_documents=boilerplate_min_documents),
+        )
+        # Near-duplicate chunks are collapsed within each call (a document or a directory run);
+        # dedup_across_calls=True keeps one deduplicator for the preprocessor's lifetime instead
+        self.dedup_threshold = dedup_threshold
+        self._shared_deduplicator = (
+            ChunkDeduplicator(dedup_threshold) if dedup_threshold and dedup_across_calls else None
+        )
+        # Voice activity detection so silence and breaks are never sent to Whisper
+        audio_vad = EnergyVAD() if audio_vad is True else audio_vad or None
+        # Worker processes transcribing several recordings (or windows of a long one) at once
+        self.transcriber_pool = (
+            TranscriberPool(audio_model, audio_workers, audio_memory_budget, vad=audio_vad)
+            if audio_workers > 1 else None
+        )
+        # Shared transcriber; its Whisper model is loaded on first use and kept between calls
+        self.transcriber = Transcriber(audio_model, pool=self.transcriber_pool, vad=audio_vad)
+        # Audio files found by the latest preprocess_directory call, for chunk_audio();
+        # concurrent callers should use the audio_files output of their own call instead
         self.audio_sources = []
         # Create necessary directories
         os.makedirs(self.json_path, exist_ok=True)
 
     def create_processor(self, file_path):
         """Factory method to create the appropriate document processor"""
-        file_extension = os.path.splitext(file_path)[1].lower()
-        if file_extension == '.pptx':
-            return PowerPointProcessor(file_path, self.json_path)
-        elif file_extension == '.pdf':
-            return PDFProcessor(file_path, "pymupdf", self.json_path)
-        else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
+        return build_processor(
+            file_path, self.json_path, self.page_workers, self.cache, self.ocr_pool, self.output_format
+        )
+
+    def warm_up(self):
+        """Load the shared embedding model before the first document is chunked"""
+        retriever.warm_up()
+
+    def flush_caches(self):
+        """Persist the embedding cache and the topic model; done once per run rather than per document"""
+        if self.chunker.embedding_cache is not None:
+            self.chunker.embedding_cache.flush()
+        if self.chunker.topic_model is not None:
+            self.chunker.topic_model.save()
+
+    def shutdown(self):
+        """Stop the long-lived worker pools owned by this preprocessor"""
+        self.flush_caches()
+        if self.ocr_pool is not None:
+            self.ocr_pool.shutdown()
+        if self.transcriber_pool is not None:
+            self.transcriber_pool.shutdown()
+
+    def _cache_run(self):
+        """Keep extraction cache entries used until the block exits from being evicted"""
+        return self.cache.run() if self.cache is not None else nullcontext()
+
+    def new_deduplicator(self):
+        """Deduplicator for one call, or None when deduplication is off"""
+        if self._shared_deduplicator is not None:
+            return self._shared_deduplicator
+        return ChunkDeduplicator(self.dedup_threshold) if self.dedup_threshold else None
 
     def preprocess_document(self, file_path):
-        """Process a single document and return its JSON representation"""
+        """
+        Process a single document and return its JSON representation. Raises
+        the error that stopped the extraction if the document could not be processed.
+        """
+        return run_processor(self.create_processor(file_path))
+
+    def chunk_document(self, file_path, strategy="merge", persist_json=False, deduplicator=None):
+        """
+        Extract and chunk a single document in-process.
+
+        With persist_json=False the extracted pages are handed straight to the
+        chunker; chunk sources then refer to the original document. Images are
+        still written to disk, and with an extraction cache the pages are
+        also written out so re-uploads of the same content are cache hits. Duplicates are
+        collapsed within the document unless a run-wide deduplicator is given.
+        """
+        if deduplicator is None:
+            deduplicator = self.new_deduplicator()
+        if persist_json:
+            json_file = self.preprocess_document(file_path)
+            return self.chunker.chunk(json_file, strategy=strategy, deduplicator=deduplicator)
         processor = self.create_processor(file_path)
-        json_file = processor.extract_text_and_images()
-        return json_file
+        cached = processor._cached_output()
+        if cached:
+            pages = (page for _, page in Chunker._iter_pages(cached))
+            return self.chunker.chunk_pages(
+                file_path, processor.doc_type, pages, strategy=strategy, deduplicator=deduplicator
+            )
+        pages = processor.iter_and_cache_pages() if self.cache is not None else processor.iter_pages()
+        try:
+            return self.chunker.chunk_pages(
+                file_path, processor.doc_type, pages, strategy=strategy, deduplicator=deduplicator
+            )
+        except Exception:
+            # Same as a failed JSON extraction: leave no half-written images behind
+            shutil.rmtree(processor.folder_path, ignore_errors=True)
+            raise
 
-    def preprocess_directory(self, source_dir, parallel=True, max_workers=None):
-        """Process all documents in a directory and return their JSON representations"""
+    @staticmethod
+    def _collect_sources(source_dir):
+        """Walk a directory and return its sorted document paths and sorted audio paths"""
         if not os.path.exists(source_dir):
             raise ValueError(f"Source directory does not exist: {source_dir}")
-        audio_paths = []
         doc_paths = []
+        audio_paths = []
         for root, _, files in os.walk(source_dir):
             for file in files:
                 file_path = os.path.join(root, file)
@@ -46,44 +162,111 @@ class InputPreprocessor:
                 if ext in ['.pdf', '.pptx']:  # Add more extensions as needed
                     doc_paths.append(file_path)
                 elif ext in [".mp3", ".wav", ".audio"]:
-                    self.audio_sources.append(file_path)
-            print(self.audio_sources)
-        # Process files sequentially or in parallel
-        if parallel and len(doc_paths) > 1:
-            if max_workers is None:
-                max_workers = min(multiprocessing.cpu_count(), len(doc_paths))
+                    audio_paths.append(file_path)
+            print(audio_paths)
+        doc_paths.sort()
+        audio_paths.sort()
+        return doc_paths, audio_paths
+
+    def preprocess_directory(self, source_dir, parallel=True, max_workers=None, executor="thread", *,
+                             audio_files=None, failed_documents=None):
+        """
+        Process all documents in a directory and return their JSON representations.
+
+        Args:
+            source_dir: Directory to walk for documents and audio files
+            parallel: Whether to process documents concurrently
+            max_workers: Number of workers, defaults to the number of CPUs
+            executor: 'thread' for a thread pool or 'process' to run the
+                CPU-bound extraction (PyMuPDF, python-pptx, tesseract) in
+                worker processes
+
+            audio_files: Optional list that receives the audio files found
+            failed_documents: Optional dict that receives the path and error
+                of every document that could not be processed
 
+        Returns:
+            A dict mapping each document path to its JSON file, in sorted
+            path order. The audio files found are also kept in
+            self.audio_sources for chunk_audio(); concurrent calls should
+            pass their own audio_files and failed_documents instead.
+        """
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor: {executor}. Available executors: thread, process")
+        doc_paths, audio_paths = self._collect_sources(source_dir)
+        self.audio_sources = audio_paths
+        if audio_files is not None:
+            audio_files.extend(audio_paths)
+        if failed_documents is None:
+            failed_documents = {}
+        with self._cache_run():
+            # Process files sequentially or in parallel
             results = {}
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # Submit all tasks and keep track of them
-                future_to_path = {executor.submit(self.preprocess_document, path): path for path in doc_paths}
+            if parallel and len(doc_paths) > 1:
+                if max_workers is None:
+                    max_workers = min(multiprocessing.cpu_count(), len(doc_paths))
+
+                if executor == "process":
+                    pool = ProcessPoolExecutor(
+                        max_workers=max_workers,
+                        initializer=init_extraction_worker,
+                        initargs=(self.ocr_cache_path,),
+                    )
+                    submit = lambda path: pool.submit(
+                        extract_document, path, self.json_path, self.page_workers, self.cache, self.output_format
+                    )
+                else:
+                    pool = ThreadPoolExecutor(max_workers=max_workers)
+                    submit = lambda path: pool.submit(self.preprocess_document, path)
 
-                # Process results as they complete
-                for future in future_to_path:
-                    path = future_to_path[future]
+                with pool:
+                    # Submit all tasks and keep track of them
+                    future_to_path = {submit(path): path for path in doc_paths}
+
+                    # Collect results in submission order so the output is deterministic
+                    for future, path in future_to_path.items():
+                        try:
+                            results[path] = future.result()
+                        except Exception as e:
+                            failed_documents[path] = str(e)
+                            print(f"Error processing {path}: {e}")
+            else:
+                # Sequential processing
+                for path in doc_paths:
                     try:
-                        json_file = future.result()
-                        results[path] = json_file
+                        results[path] = self.preprocess_document(path)
                     except Exception as e:
+                        failed_documents[path] = str(e)
                         print(f"Error processing {path}: {e}")
-        else:
-            # Sequential processing
-            results = {}
-            for path in doc_paths:
-                try:
-                    json_file = self.preprocess_document(path)
-                    results[path] = json_file
-                except Exception as e:
-                    print(f"Error processing {path}: {e}")
         return results
 
     def chunk_documents(
-        self, json_files, strategy="merge", parallel=True, max_workers=None
+        self, json_files, strategy="merge", parallel=True, max_workers=None, batch_embed=False, batch_size=256,
+        corpus_retrieval=False
     ):
-        """Chunk multiple processed documents and return all chunks and images"""
+        """
+        Chunk multiple processed documents and return all chunks and images.
+
+        With batch_embed=True the chunks of every document are embedded
+        together in length-sorted batches of batch_size before the
+        per-document key chunk selection, instead of one small encode call
+        per document. Adding corpus_retrieval=True selects key chunks over the
+        whole corpus in one pass rather than per document, searching the
+        vector index when one is configured.
+        """
+        deduplicator = self.new_deduplicator()
         if isinstance(json_files, str):
             # Single JSON file
-            return {json_files: self.chunker.chunk(json_files, strategy=strategy)}
+            result = {json_files: self.chunker.chunk(json_files, strategy=strategy, deduplicator=deduplicator)}
+            self.flush_caches()
+            return result
+
+        if batch_embed or corpus_retrieval:
+            result = self._chunk_documents_batched(
+                json_files, strategy, parallel, max_workers, batch_size, corpus_retrieval, deduplicator
+            )
+            self.flush_caches()
+            return result
 
         if parallel and len(json_files) > 1:
             if max_workers is None:
@@ -91,7 +274,7 @@ class InputPreprocessor:
 
             results = {}
             with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                future_to_json = {executor.submit(self.chunker.chunk, json_path, strategy): json_path 
+                future_to_json = {executor.submit(self.chunker.chunk, json_path, strategy, True, deduplicator): json_path
                                  for json_path in json_files.values()}
 
                 for future in future_to_json:
@@ -113,24 +296,198 @@ class InputPreprocessor:
             all_chunks = []
             all_images = []
             for original_path, json_path in json_files.items():
-                chunks, images = self.chunker.chunk(json_path, strategy=strategy)
+                chunks, images = self.chunker.chunk(json_path, strategy=strategy, deduplicator=deduplicator)
                 all_chunks.extend(chunks)
                 all_images.extend(images)
+        self.flush_caches()
         return all_chunks, all_images
 
-    def chunk_audio(self):
-        model = Transcriber('base')
+    def _chunk_documents_batched(self, json_files, strategy, parallel, max_workers, batch_size,
+                                 corpus_retrieval=False, deduplicator=None):
+        json_paths = list(json_files.values())
+        prepared = []
+        if parallel and len(json_paths) > 1:
+            if max_workers is None:
+                max_workers = min(multiprocessing.cpu_count(), len(json_paths))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(self.chunker.chunk, path, strategy, False, deduplicator) for path in json_paths
+                ]
+                for json_path, future in zip(json_paths, futures):
+                    try:
+                        prepared.append(future.result())
+                    except Exception as e:
+                        print(f"Error chunking {json_path}: {e}")
+        else:
+            for json_path in json_paths:
+                try:
+                    prepared.append(
+                        self.chunker.chunk(json_path, strategy=strategy, rag=False, deduplicator=deduplicator)
+                    )
+                except Exception as e:
+                    print(f"Error chunking {json_path}: {e}")
+
+        texts = [chunk.text for chunks, _ in prepared for chunk in chunks]
+        embeddings = retriever.encode_batched(
+            retriever.get_encoder(), texts, batch_size, self.chunker.embedding_cache
+        )
+
+        if corpus_retrieval:
+            all_chunks = [chunk for chunks, _ in prepared for chunk in chunks]
+            all_images = [image for _, images in prepared for image in images]
+            return self.chunker.select_key_chunks(all_chunks, embeddings, search_index=True), all_images
+
+        all_chunks = []
+        all_images = []
+        offset = 0
+        for chunks, images in prepared:
+            doc_embeddings = embeddings[offset:offset + len(chunks)]
+            offset += len(chunks)
+            all_chunks.extend(self.chunker.select_key_chunks(chunks, doc_embeddings))
+            all_images.extend(images)
+        return all_chunks, all_images
+
+    def _iter_audio_results(self, audio_files):
+        """Yield (chunks, transcript) for every audio file, in order"""
+        if self.transcriber_pool is not None and len(audio_files) > 1:
+            yield from self.transcriber_pool.iter_files(audio_files)
+        else:
+            for file in audio_files:
+                yield self.transcriber.audio_to_sources(file)
+
+    def chunk_audio(self, audio_files=None):
+        """
+        Transcribe audio files into AudioChunks; by default the ones found by
+        the latest preprocess_directory call
+        """
+        if audio_files is None:
+            audio_files = self.audio_sources
         audio_chunks = []
-        for file in self.audio_sources:
-            chunks, _ = model.audio_to_sources(file)
+        for chunks, _ in self._iter_audio_results(audio_files):
             audio_chunks.extend(chunks)
         return audio_chunks
 
-    def process_and_chunk_directory(self, source_dir, chunk_strategy='merge', parallel=True):
-        """Complete pipeline: process all documents in a directory and chunk them"""
-        json_files = self.preprocess_directory(source_dir, parallel=parallel)
-        chunks, images = self.chunk_documents(json_files, strategy=chunk_strategy, parallel=parallel)
-        chunks.extend(self.chunk_audio())
+    def _chunk_directory_in_memory(self, source_dir, strategy, parallel=True, max_workers=None):
+        """
+        Extract and chunk every document without writing intermediate JSON
+        files. Returns (chunks, images, audio_files, failed_documents).
+        """
+        doc_paths, audio_paths = self._collect_sources(source_dir)
+        failed_documents = {}
+        deduplicator = self.new_deduplicator()
+        with self._cache_run():
+            results = {}
+            if parallel and len(doc_paths) > 1:
+                if max_workers is None:
+                    max_workers = min(multiprocessing.cpu_count(), len(doc_paths))
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    future_to_path = {
+                        executor.submit(self.chunk_document, path, strategy, False, deduplicator): path
+                        for path in doc_paths
+                    }
+                    for future, path in future_to_path.items():
+                        try:
+                            results[path] = future.result()
+                        except Exception as e:
+                            failed_documents[path] = str(e)
+                            print(f"Error processing {path}: {e}")
+            else:
+                for path in doc_paths:
+                    try:
+                        results[path] = self.chunk_document(path, strategy, deduplicator=deduplicator)
+                    except Exception as e:
+                        failed_documents[path] = str(e)
+                        print(f"Error processing {path}: {e}")
+
+        all_chunks = []
+        all_images = []
+        for chunks, images in results.values():
+            all_chunks.extend(chunks)
+            all_images.extend(images)
+        self.flush_caches()
+        return all_chunks, all_images, audio_paths, failed_documents
+
+    def stream_directory(self, source_dir, chunk_strategy='merge', max_workers=None, max_pending=None,
+                         persist_json=False, include_audio=True, failed_documents=None):
+        """
+        Generator pipeline from files to chunks.
+
+        Yields Chunk and ImageSource objects (then AudioChunk objects) as soon
+        as each document has been extracted and chunked, in completion order.
+        At most max_pending documents are in flight at a time and new ones are
+        only started as the consumer pulls results, so a slow consumer applies
+        backpressure instead of the whole directory piling up in memory.
+        Documents that fail are recorded in the failed_documents dict, if one
+        is passed, as they are encountered.
+        """
+        doc_paths, audio_paths = self._collect_sources(source_dir)
+        if failed_documents is None:
+            failed_documents = {}
+        if max_workers is None:
+            max_workers = max(1, min(multiprocessing.cpu_count(), len(doc_paths)))
+        if max_pending is None:
+            max_pending = max_workers
+        deduplicator = self.new_deduplicator()
+
+        remaining = iter(doc_paths)
+        with self._cache_run(), ThreadPoolExecutor(max_workers=max_workers) as executor:
+            in_flight = {}
+
+            def submit_next():
+                path = next(remaining, None)
+                if path is not None:
+                    future = executor.submit(self.chunk_document, path, chunk_strategy, persist_json, deduplicator)
+                    in_flight[future] = path
+
+            for _ in range(max_pending):
+                submit_next()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = in_flight.pop(future)
+                    submit_next()
+                    try:
+                        chunks, images = future.result()
+                    except Exception as e:
+                        failed_documents[path] = str(e)
+                        print(f"Error processing {path}: {e}")
+                        continue
+                    yield from chunks
+                    yield from images
+        self.flush_caches()
+
+        if include_audio:
+            for chunks, _ in self._iter_audio_results(audio_paths):
+                yield from chunks
+
+    def process_and_chunk_directory(self, source_dir, chunk_strategy='merge', parallel=True, executor="thread",
+                                    persist_json=True, *, failed_documents=None):
+        """
+        Complete pipeline: process all documents in a directory and chunk them.
+
+        With persist_json=False extraction feeds the chunker in-process and the
+        JSON round trip through disk is skipped. Documents that fail are
+        recorded in the failed_documents dict, if one is passed.
+
+        Returns (chunks, images).
+        """
+        if persist_json:
+            audio_paths = []
+            # The JSON files must outlive extraction until they are chunked
+            with self._cache_run():
+                json_files = self.preprocess_directory(
+                    source_dir, parallel=parallel, executor=executor, audio_files=audio_paths,
+                    failed_documents=failed_documents,
+                )
+                chunks, images = self.chunk_documents(json_files, strategy=chunk_strategy, parallel=parallel)
+        else:
+            chunks, images, audio_paths, failed = self._chunk_directory_in_memory(
+                source_dir, chunk_strategy, parallel=parallel
+            )
+            if failed_documents is not None:
+                failed_documents.update(failed)
+        chunks.extend(self.chunk_audio(audio_paths))
         i=1
         for chunk in chunks:
             print(i)
@@ -1,32 +1,116 @@
+import threading
 from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import TfidfVectorizer
 import numpy as np
+from input_preprocessing.documents.utils.vector_index import top_k_unvisited
+from input_preprocessing.documents.utils.topics import TopicModel
+
+DEFAULT_ENCODER = "all-MiniLM-L6-v2"
+
+# Process-wide encoder registry so each model is loaded once and shared
+_encoders = {}
+_encoders_lock = threading.Lock()
+_encoder_locks = {}
+
+
+def get_encoder(model_name=DEFAULT_ENCODER):
+    """Return the shared encoder for model_name, loading it on first use."""
+    encoder = _encoders.get(model_name)
+    if encoder is not None:
+        return encoder
+    with _encoders_lock:
+        model_lock = _encoder_locks.setdefault(model_name, threading.Lock())
+    # Per-model lock: concurrent callers wait for one load instead of loading copies
+    with model_lock:
+        encoder = _encoders.get(model_name)
+        if encoder is None:
+            encoder = SentenceTransformer(model_name)
+            _encoders[model_name] = encoder
+    return encoder
+
+
+def warm_up(model_names=(DEFAULT_ENCODER,)):
+    """Load encoders ahead of the first request."""
+    for model_name in model_names:
+        get_encoder(model_name)
+
+
+def encode_batched(encoder, texts, batch_size=256, embedding_cache=None):
+    """
+    Encode texts in large, length-sorted batches and return the embeddings in
+    the original order. Sorting by length keeps padding low within a batch.
+    """
+    if not texts:
+        return encoder.encode(texts)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    embeddings = None
+    for start in range(0, len(order), batch_size):
+        indices = order[start:start + batch_size]
+        batch = [texts[i] for i in indices]
+        if embedding_cache is not None:
+            vectors = embedding_cache.encode(encoder, batch, batch_size=batch_size)
+        else:
+            vectors = encoder.encode(batch, batch_size=batch_size)
+        if embeddings is None:
+            embeddings = np.empty((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+        embeddings[indices] = vectors
+    if embedding_cache is not None:
+        embedding_cache.flush()
+    return embeddings
+
 
 class Retriever:
-    def __init__(self, chunks):
-        self.encoder = SentenceTransformer("all-MiniLM-L6-v2")
-        self.tf_idf = TfidfVectorizer(stop_words="english")
+    def __init__(self, chunks, model_name=DEFAULT_ENCODER, embedding_cache=None, embeddings=None, index=None,
+                 topic_model=None, search_index=False):
+        self.model_name = model_name
+        # Optional corpus-wide VectorIndex the chunks are appended to. Selection
+        # within a document uses the document's own embeddings; with
+        # search_index=True (a pass over a whole corpus) it goes through the index
+        self.index = index
+        self.search_index = search_index and index is not None
+        # Index ids of self.chunks, in order, once they have been added
+        self._index_ids = None
+        self.encoder = get_encoder(model_name)
+        if embedding_cache is not None and embedding_cache.model_name != model_name:
+            raise ValueError(f"Embedding cache holds vectors for {embedding_cache.model_name}, "
+                             f"not {model_name}")
+        # Flushed by the owner once per run (see InputPreprocessor.flush_caches), not per document
+        self.embedding_cache = embedding_cache
+        # A shared TopicModel accumulates corpus-wide document frequencies and is
+        # saved by its owner once per run; the default one only sees this document
+        self.topic_model = topic_model if topic_model is not None else TopicModel()
         self.chunks=chunks
         
-        self.chunk_embeddings = None
-        self.tf_idf_matrix = None
+        # Precomputed chunk embeddings, e.g. from a cross-document batch
+        self.chunk_embeddings = embeddings
         self.key_topics = None
 
     def _embed_chunks(self):
         texts = [chunk.text for chunk in self.chunks]
-        self.chunk_embeddings = self.encoder.encode(texts)
+        if self.chunk_embeddings is None:
+            self.chunk_embeddings = self._encode(texts)
+        if self.index is not None and self.chunks:
+            self._index_ids = self.index.add(self.chunk_embeddings, metadata=[
+                {"source": chunk.source, "type": chunk.type, "start": chunk.start, "end": chunk.end,
+                 "text": chunk.text}
+                for chunk in self.chunks
+            ])
+            if self.search_index:
+                # Selection only reads the index, so keep a view of its rows (memory-mapped
+                # and scored on the quantized copy for a MemmapIndex) instead of a second copy
+                first_id = int(self._index_ids[0])
+                self.chunk_embeddings = self.index.vectors[first_id:first_id + len(self._index_ids)]
 
-        # Also create TF-IDF representation for topic extraction
-        self.tf_idf_matrix = self.tf_idf.fit_transform(texts)
+    def _encode(self, texts):
+        if self.embedding_cache is None:
+            return self.encoder.encode(texts)
+        return self.embedding_cache.encode(self.encoder, texts)
 
     def _extract_key_topics(self, num_terms=10):
         if not self.chunks:
+            self.key_topics = []
             return []
-        feature_names = self.tf_idf.get_feature_names_out()
-        tf_idf_sum = np.array(self.tf_idf_matrix.sum(axis=0))[0]
-        top_indices = tf_idf_sum.argsort()[-num_terms:][::-1]
-        top_terms = [feature_names[i] for i in top_indices]
-        self.key_topics = top_terms
+        texts = [chunk.text for chunk in self.chunks]
+        self.key_topics = self.topic_model.top_terms(texts, num_terms)
 
     def _retrieve_relevant_chunks(self, query, top_k=5):
         if not self.chunks or self.chunk_embeddings is None:
@@ -51,13 +135,68 @@ class Retriever:
         
         return result_chunks
 
-    def extract_key_chunks(self):
+    def _retrieve_key_chunks_vectorized(self, top_k=5):
+        """
+        Same greedy selection as calling _retrieve_relevant_chunks per topic,
+        but all topics are encoded in one call and scored with one
+        topic-by-chunk similarity matrix.
+        """
+        if not self.chunks or not self.key_topics or self.chunk_embeddings is None:
+            return []
+
+        topic_embeddings = self.encoder.encode(list(self.key_topics))
+        similarity_matrix = np.dot(topic_embeddings, np.asarray(self.chunk_embeddings).T)
+        visited = np.array([chunk._visited for chunk in self.chunks], dtype=bool)
+
+        key_chunks = []
+        for similarities in similarity_matrix:
+            selected = top_k_unvisited(similarities, visited, top_k)
+            visited[selected] = True
+            for idx in selected:
+                chunk = self.chunks[idx]
+                chunk._visited = True
+                key_chunks.append(chunk)
+        return key_chunks
+
+    def _retrieve_key_chunks_from_index(self, top_k=5):
+        """
+        Same greedy selection as _retrieve_key_chunks_vectorized, but every
+        topic is a search on the vector index, so a query only scores the
+        candidates the index probes (e.g. a few IVF lists) rather than every
+        chunk of the corpus. Ids of chunks outside this pass are excluded.
+        """
+        if not self.chunks or not self.key_topics or self._index_ids is None:
+            return []
+
+        topic_embeddings = self.encoder.encode(list(self.key_topics))
+        # Built once per pass; searches only look up the ids they probe
+        exclude = np.ones(len(self.index), dtype=bool)
+        exclude[self._index_ids] = [chunk._visited for chunk in self.chunks]
+        # add() hands out consecutive ids, so an id maps straight back to its chunk
+        first_id = int(self._index_ids[0])
+
+        key_chunks = []
+        for topic_embedding in topic_embeddings:
+            ids, _ = self.index.search(topic_embedding, top_k, exclude=exclude)
+            exclude[ids] = True
+            for idx in ids:
+                chunk = self.chunks[idx - first_id]
+                chunk._visited = True
+                key_chunks.append(chunk)
+        return key_chunks
+
+    def extract_key_chunks(self, vectorized=True):
         self._embed_chunks()
         self._extract_key_topics()
         print(f"Key topics:\n{self.key_topics}")
-        key_chunks = []
-        for topic in self.key_topics:
-            key_chunks.extend(self._retrieve_relevant_chunks(topic))
+        if self.search_index:
+            key_chunks = self._retrieve_key_chunks_from_index()
+        elif vectorized:
+            key_chunks = self._retrieve_key_chunks_vectorized()
+        else:
+            key_chunks = []
+            for topic in self.key_topics:
+                key_chunks.extend(self._retrieve_relevant_chunks(topic))
         print(f"Total number of chunks = {len(self.chunks)}")
         print(f"Number of relevant chunks = {len(key_chunks)}")
         self._print_irrelevant_chunks()
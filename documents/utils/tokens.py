@@ -0,0 +1,59 @@
+import re
+from abc import ABC, abstractmethod
+from nltk.tokenize import word_tokenize
+
+
+class TokenCounter(ABC):
+    """Token counting engine used by Chunker to size chunks."""
+
+    # True when the count of space-joined texts is always the sum of their
+    # counts, so cached counts of merged chunks can be added up
+    additive = False
+
+    @abstractmethod
+    def tokenize(self, text):
+        pass
+
+    def count(self, text):
+        return len(self.tokenize(text))
+
+
+class NLTKTokenCounter(TokenCounter):
+    """NLTK's word_tokenize; exact but slow on long texts."""
+
+    def tokenize(self, text):
+        return word_tokenize(text)
+
+
+class RegexTokenCounter(TokenCounter):
+    """
+    Single compiled regex approximating word_tokenize: words (with inner
+    hyphens, apostrophes and decimal points) and individual punctuation marks.
+    Tokens never span whitespace, so counts of space-joined texts add up.
+    """
+
+    additive = True
+
+    pattern = re.compile(r"\w+(?:[-'.,]\w+)*|[^\w\s]")
+
+    def tokenize(self, text):
+        return self.pattern.findall(text)
+
+    def count(self, text):
+        return sum(1 for _ in self.pattern.finditer(text))
+
+
+TOKEN_COUNTERS = {
+    "regex": RegexTokenCounter,
+    "nltk": NLTKTokenCounter,
+}
+
+
+def get_token_counter(engine="regex"):
+    """Return a TokenCounter for an engine name, or the engine itself if it already is one."""
+    if isinstance(engine, TokenCounter):
+        return engine
+    if engine not in TOKEN_COUNTERS:
+        raise ValueError(f"Unknown token counter: {engine}. "
+                         f"Available token counters: {', '.join(TOKEN_COUNTERS.keys())}")
+    return TOKEN_COUNTERS[engine]()
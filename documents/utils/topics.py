@@ -0,0 +1,72 @@
+import json
+import math
+import os
+import threading
+from collections import Counter
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+
+class TopicModel:
+    """
+    Incremental TF-IDF topic extractor.
+
+    Keeps corpus-level document frequencies (one document per chunk, as in
+    TfidfVectorizer) that grow as documents are added, so nothing is ever
+    refit. Per-document top terms are computed from sparse term counts with
+    the same weighting as TfidfVectorizer: raw counts times smoothed IDF,
+    L2-normalised per chunk and summed over the document's chunks. With a
+    path the frequencies are persisted across runs.
+    """
+
+    def __init__(self, path=None, stop_words="english"):
+        self.path = path
+        self._analyzer = TfidfVectorizer(stop_words=stop_words).build_analyzer()
+        self._lock = threading.Lock()
+        self.doc_freq = Counter()
+        self.n_docs = 0
+        if path and os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+            self.doc_freq.update(state["doc_freq"])
+            self.n_docs = state["n_docs"]
+
+    def _idf(self, term):
+        return math.log((1 + self.n_docs) / (1 + self.doc_freq[term])) + 1
+
+    def add_documents(self, texts):
+        """Count terms per text, fold them into the document frequencies and return the counts."""
+        term_counts = [Counter(self._analyzer(text)) for text in texts]
+        with self._lock:
+            for counts in term_counts:
+                self.doc_freq.update(counts.keys())
+            self.n_docs += len(term_counts)
+        return term_counts
+
+    def top_terms(self, texts, num_terms=10, update=True):
+        """Top TF-IDF terms of a document given as a list of chunk texts."""
+        if update:
+            term_counts = self.add_documents(texts)
+        else:
+            term_counts = [Counter(self._analyzer(text)) for text in texts]
+
+        scores = Counter()
+        with self._lock:
+            for counts in term_counts:
+                weights = {term: count * self._idf(term) for term, count in counts.items()}
+                norm = math.sqrt(sum(w * w for w in weights.values()))
+                if not norm:
+                    continue
+                for term, weight in weights.items():
+                    scores[term] += weight / norm
+        # Ties go to the later term alphabetically, like argsort over the vocabulary
+        ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        return [term for term, _ in ranked[:num_terms]]
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"doc_freq": self.doc_freq, "n_docs": self.n_docs}, f)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,362 @@
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+from input_preprocessing.documents.utils.embedding_store import EmbeddingStore
+
+
+def top_k_unvisited(similarities, visited, top_k):
+    """
+    Indices of the top_k highest similarities among unvisited chunks, highest
+    first. Ties keep chunk order, matching a stable descending sort.
+    """
+    candidates = np.flatnonzero(~visited)
+    if candidates.size == 0:
+        return candidates
+    scores = similarities[candidates]
+    if candidates.size > top_k:
+        # Partial selection: keep everything tied with the k-th best score
+        kth_score = np.partition(scores, candidates.size - top_k)[candidates.size - top_k]
+        keep = scores >= kth_score
+        candidates, scores = candidates[keep], scores[keep]
+    order = np.lexsort((candidates, -scores))[:top_k]
+    return candidates[order]
+
+
+class VectorIndex(ABC):
+    """
+    Base class for the vector indexes behind Retriever.
+
+    Vectors get sequential integer ids in insertion order, so indexes can be
+    grown incrementally as new documents are chunked. Each id can carry a
+    JSON-serializable metadata record (e.g. the chunk's source, location and
+    text) that is saved with the index, so a loaded index can still say
+    which chunk a hit refers to. ``search`` takes an optional boolean
+    ``exclude`` mask over ids; ids past the end of the mask are excluded.
+    """
+
+    kind = None
+
+    @abstractmethod
+    def __len__(self):
+        pass
+
+    @abstractmethod
+    def add(self, vectors, metadata=None):
+        """Add vectors (and one metadata record per vector) and return their ids."""
+        pass
+
+    @abstractmethod
+    def search(self, query, k, exclude=None):
+        """Return (ids, scores) of the k best matches for one query vector."""
+        pass
+
+    def metadata(self, ids):
+        """Metadata records of ids, None where none was given."""
+        records = self._metadata
+        return [records[i] if i < len(records) else None for i in ids]
+
+    @staticmethod
+    def _exclude_mask(exclude, size):
+        """Fit an exclude mask to the index size; ids added since it was built are excluded."""
+        if exclude is None:
+            return np.zeros(size, dtype=bool)
+        if len(exclude) < size:
+            return np.concatenate([exclude, np.ones(size - len(exclude), dtype=bool)])
+        return exclude[:size]
+
+    @staticmethod
+    def _is_excluded(ids, exclude):
+        """Exclude mask looked up for a subset of ids only."""
+        excluded = ids >= len(exclude)
+        inside = ~excluded
+        excluded[inside] = exclude[ids[inside]]
+        return excluded
+
+    @abstractmethod
+    def _state(self):
+        pass
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, kind=np.array(self.kind), metadata=np.array(json.dumps(self._metadata)), **self._state())
+
+    @staticmethod
+    def load(path):
+        with np.load(path, allow_pickle=False) as data:
+            kind = str(data["kind"])
+            state = {key: data[key] for key in data.files if key != "kind"}
+        if kind not in INDEX_TYPES:
+            raise ValueError(f"Unknown index kind: {kind}. Available kinds: {', '.join(INDEX_TYPES.keys())}")
+        index = INDEX_TYPES[kind]._from_state(state)
+        if "metadata" in state:
+            index._metadata = json.loads(str(state["metadata"]))
+        return index
+
+
+class FlatIndex(VectorIndex):
+    """Exact brute-force inner-product index; the baseline for the others."""
+
+    kind = "flat"
+
+    def __init__(self, dim=None, initial_capacity=1024):
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        # Grown by doubling, so adds are amortized O(len(vectors)) and reads are views
+        self._buffer = None
+        self._size = 0
+        self._metadata = []
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def vectors(self):
+        with self._lock:
+            if self._buffer is None:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+            return self._buffer[:self._size]
+
+    def _append(self, vectors):
+        start, stop = self._size, self._size + len(vectors)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        capacity = 0 if self._buffer is None else len(self._buffer)
+        if stop > capacity:
+            buffer = np.empty((max(stop, 2 * capacity, self.initial_capacity), self.dim), dtype=np.float32)
+            if start:
+                buffer[:start] = self._buffer[:start]
+            self._buffer = buffer
+        self._buffer[start:stop] = vectors
+        self._size = stop
+        return np.arange(start, stop)
+
+    def add(self, vectors, metadata=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            ids = self._append(vectors)
+            self._metadata.extend(metadata if metadata is not None else [None] * len(vectors))
+        return ids
+
+    def search(self, query, k, exclude=None):
+        similarities = np.dot(self.vectors, np.asarray(query, dtype=np.float32))
+        ids = top_k_unvisited(similarities, self._exclude_mask(exclude, len(similarities)), k)
+        return ids, similarities[ids]
+
+    def _state(self):
+        return {"vectors": self.vectors}
+
+    def _load_vectors(self, vectors):
+        if len(vectors):
+            self._append(np.asarray(vectors, dtype=np.float32))
+
+    @classmethod
+    def _from_state(cls, state):
+        index = cls(dim=state["vectors"].shape[1])
+        index._load_vectors(state["vectors"])
+        return index
+
+
+class IVFIndex(FlatIndex):
+    """
+    Approximate inverted-file index built in-process with k-means.
+
+    Vectors are assigned to the nearest of nlist centroids and kept in one
+    id list per centroid. A query only scores the ids in its nprobe closest
+    lists (more when too few unexcluded ids turn up), so query cost grows
+    with roughly nprobe / nlist of the corpus. Until min_train_size vectors
+    have been added the index answers exactly, like FlatIndex. New vectors
+    added after training are appended to the lists of the existing
+    centroids.
+    """
+
+    kind = "ivf"
+
+    def __init__(self, dim=None, nlist=256, nprobe=8, min_train_size=None, kmeans_iterations=20, seed=0):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size or 8 * nlist
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self.centroids = None
+        # Per centroid, a list of id arrays; compacted into one array when probed
+        self._lists = None
+
+    def _assign(self, vectors):
+        return np.argmax(np.dot(vectors, self.centroids.T), axis=1)
+
+    def _build_lists(self, assignments):
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(len(self.centroids) + 1))
+        self._lists = [[order[bounds[c]:bounds[c + 1]]] for c in range(len(self.centroids))]
+
+    def _list_ids(self, c):
+        parts = self._lists[c]
+        if len(parts) > 1:
+            parts[:] = [np.concatenate(parts)]
+        return parts[0] if parts else np.empty(0, dtype=np.int64)
+
+    def train(self):
+        """Run spherical k-means over the stored vectors and rebuild the lists."""
+        with self._lock:
+            vectors = self.vectors
+            rng = np.random.default_rng(self.seed)
+            nlist = min(self.nlist, len(vectors))
+            centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+            for _ in range(self.kmeans_iterations):
+                assignments = np.argmax(np.dot(vectors, centroids.T), axis=1)
+                for c in range(nlist):
+                    members = vectors[assignments == c]
+                    if len(members):
+                        centroid = members.mean(axis=0)
+                        norm = np.linalg.norm(centroid)
+                        centroids[c] = centroid / norm if norm else centroid
+            self.centroids = centroids
+            self._build_lists(self._assign(vectors))
+
+    def add(self, vectors, metadata=None):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            ids = super().add(vectors, metadata)
+            if self.centroids is not None:
+                assignments = self._assign(vectors)
+                for c in np.unique(assignments):
+                    self._lists[c].append(ids[assignments == c])
+            elif len(self) >= self.min_train_size:
+                self.train()
+        return ids
+
+    def search(self, query, k, exclude=None):
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            if self.centroids is None:
+                return super().search(query, k, exclude)
+            list_order = np.argsort(-np.dot(self.centroids, query))
+            candidates = []
+            found = 0
+            for probed, c in enumerate(list_order):
+                # Probe further lists only until enough unexcluded candidates turn up
+                if probed >= self.nprobe and found >= k:
+                    break
+                ids = self._list_ids(c)
+                if exclude is not None:
+                    ids = ids[~self._is_excluded(ids, exclude)]
+                candidates.append(ids)
+                found += len(ids)
+            vectors = self.vectors
+        # Sorted ids keep ties in id order, as in FlatIndex
+        candidates = np.sort(np.concatenate(candidates)) if candidates else np.empty(0, dtype=np.int64)
+        similarities = np.dot(vectors[candidates], query)
+        best = top_k_unvisited(similarities, np.zeros(len(candidates), dtype=bool), k)
+        return candidates[best], similarities[best]
+
+    def _state(self):
+        state = super()._state()
+        assignments = np.empty(len(self), dtype=np.int64)
+        if self.centroids is not None:
+            for c in range(len(self.centroids)):
+                assignments[self._list_ids(c)] = c
+        state.update({
+            "params": np.array([self.nlist, self.nprobe, self.min_train_size, self.kmeans_iterations, self.seed]),
+            "assignments": assignments if self.centroids is not None else assignments[:0],
+        })
+        if self.centroids is not None:
+            state["centroids"] = self.centroids
+        return state
+
+    @classmethod
+    def _from_state(cls, state):
+        nlist, nprobe, min_train_size, kmeans_iterations, seed = (int(v) for v in state["params"])
+        index = cls(
+            dim=state["vectors"].shape[1], nlist=nlist, nprobe=nprobe, min_train_size=min_train_size,
+            kmeans_iterations=kmeans_iterations, seed=seed,
+        )
+        index._load_vectors(state["vectors"])
+        index.centroids = state.get("centroids")
+        if index.centroids is not None:
+            index._build_lists(state["assignments"])
+        return index
+
+
+class MemmapIndex(VectorIndex):
+    """
+    Exact index over a memory-mapped, optionally quantized EmbeddingStore.
+
+    Candidates are preselected on the quantized scores (rescore_factor * k of
+    them) and then rescored in full precision, so results match FlatIndex
+    except where quantization error pushes a true match out of the
+    candidate set.
+    """
+
+    kind = "memmap"
+
+    def __init__(self, path, quantization="int8", mode="r+", rescore_factor=4):
+        self.store = EmbeddingStore(path, quantization=quantization, mode=mode)
+        self.rescore_factor = rescore_factor
+        # Metadata records are appended to a JSON Lines file next to the vectors
+        self.metadata_path = os.path.join(path, "metadata.jsonl")
+        self._metadata_lock = threading.Lock()
+        self._metadata = []
+        if os.path.isfile(self.metadata_path):
+            with open(self.metadata_path, "r", encoding="utf-8") as f:
+                self._metadata = [json.loads(line) for line in f if line.strip()]
+
+    def __len__(self):
+        return len(self.store)
+
+    @property
+    def vectors(self):
+        return self.store.vectors()
+
+    def add(self, vectors, metadata=None):
+        with self._metadata_lock:
+            ids = self.store.append(vectors)
+            self.store.flush()
+            records = metadata if metadata is not None else [None] * len(ids)
+            # Rows added before metadata was recorded get None placeholders
+            records = [None] * (int(ids[0]) - len(self._metadata)) + list(records) if len(ids) else []
+            with open(self.metadata_path, "a", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record) + "\n")
+            self._metadata.extend(records)
+        return ids
+
+    def search(self, query, k, exclude=None):
+        scores = self.store.approximate_scores(query)
+        exclude = self._exclude_mask(exclude, len(scores))
+        candidates = top_k_unvisited(scores, exclude, k * self.rescore_factor)
+        # Sorted ids keep the memory-mapped reads sequential and ties in id order
+        candidates = np.sort(candidates)
+        exact = self.store.exact_scores(candidates, query)
+        best = top_k_unvisited(exact, np.zeros(len(candidates), dtype=bool), k)
+        return candidates[best], exact[best]
+
+    def save(self, path):
+        # Metadata already lives next to the store; only the settings go in the file
+        with open(path, "wb") as f:
+            np.savez(f, kind=np.array(self.kind), **self._state())
+
+    def _state(self):
+        self.store.flush()
+        return {
+            "store_path": np.array(self.store.path),
+            "quantization": np.array(self.store.quantization or ""),
+            "rescore_factor": np.array(self.rescore_factor),
+        }
+
+    @classmethod
+    def _from_state(cls, state, mode="r+"):
+        return cls(
+            str(state["store_path"]), quantization=str(state["quantization"]) or None, mode=mode,
+            rescore_factor=int(state["rescore_factor"]),
+        )
+
+
+INDEX_TYPES = {
+    FlatIndex.kind: FlatIndex,
+    IVFIndex.kind: IVFIndex,
+    MemmapIndex.kind: MemmapIndex,
+}
@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+from input_preprocessing.documents.utils.boilerplate import BoilerplateDetector
+
+
+def _page(number, *lines):
+    return SimpleNamespace(start=number, text="\n".join(lines), _token_count=None)
+
+
+def _strip(chunks):
+    return [chunk.text for chunk in BoilerplateDetector().strip(chunks)]
+
+
+def test_numeric_table_is_kept():
+    # PyMuPDF emits one table cell per line; the same integers recur on every page
+    rows = [["2022", "12", "7"], ["2023", "12", "9"], ["2024", "15", "7"]]
+    chunks = [
+        _page(number, f"Table {number}: sales by year", *[cell for row in rows for cell in row])
+        for number in range(1, 7)
+    ]
+    cells = " ".join(cell for row in rows for cell in row)
+    assert _strip(chunks) == [f"Table {number}: sales by year {cells}" for number in range(1, 7)]
+
+
+def test_numbered_list_is_kept():
+    chunks = [_page(1, "Steps", *[str(n) for n in range(1, 9)], "Done")]
+    assert _strip(chunks) == [" ".join(["Steps", *[str(n) for n in range(1, 9)], "Done"])]
+
+
+def test_bare_page_numbers_are_stripped():
+    chunks = [_page(number, f"Body text of page {number}", str(number)) for number in range(1, 7)]
+    assert _strip(chunks) == [f"Body text of page {number}" for number in range(1, 7)]
+
+
+def test_offset_page_numbers_are_stripped():
+    # Printed numbers that start after the front matter still track the page
+    chunks = [_page(number, str(number - 4), f"Body text of page {number}") for number in range(5, 11)]
+    assert _strip(chunks) == [f"Body text of page {number}" for number in range(5, 11)]
+
+
+def test_page_number_edges_span_the_chunks_of_a_page():
+    chunks = []
+    for number in range(1, 6):
+        chunks += [_page(number, f"Heading {number}", "7"), _page(number, "7", f"Text {number}", str(number))]
+    texts = _strip(chunks)
+    # '7' ends the first chunk and opens the second, but neither is a page edge
+    assert texts[0::2] == [f"Heading {number} 7" for number in range(1, 6)]
+    assert texts[1::2] == [f"7 Text {number}" for number in range(1, 6)]
+
+
+def test_decorated_page_numbers_are_stripped_anywhere():
+    chunks = [
+        _page(number, f"Intro {number}", f"- {number} -", f"Body {number}", f"Slide {number} of 5")
+        for number in range(1, 6)
+    ]
+    assert _strip(chunks) == [f"Intro {number} Body {number}" for number in range(1, 6)]
+
+
+def test_numbered_exercises_are_kept():
+    chunks = [_page(1, *[f"Exercise {n}" for n in range(1, 6)])]
+    assert _strip(chunks) == [" ".join(f"Exercise {n}" for n in range(1, 6))]
@@ -0,0 +1,43 @@
+import os
+
+from input_preprocessing.documents.utils.cache import ExtractionCache
+
+
+def _extraction(root, name, size=100):
+    folder = os.path.join(root, name)
+    os.makedirs(folder, exist_ok=True)
+    json_path = os.path.join(folder, f"{name}.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        f.write("x" * size)
+    return json_path, folder
+
+
+def test_outputs_of_a_run_survive_a_tiny_budget(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=1)
+    outputs = [_extraction(str(tmp_path), f"doc{i}") for i in range(3)]
+    with cache.run():
+        for i, (json_path, folder) in enumerate(outputs):
+            cache.put(f"key{i}", json_path, folder)
+        assert all(os.path.isfile(json_path) for json_path, _ in outputs)
+        assert all(cache.get(f"key{i}") == json_path for i, (json_path, _) in enumerate(outputs))
+
+
+def test_entries_are_evicted_outside_a_run(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=150)
+    first, second = _extraction(str(tmp_path), "first"), _extraction(str(tmp_path), "second")
+    with cache.run():
+        cache.put("first", *first)
+    cache.put("second", *second)
+    assert not os.path.exists(first[1])
+    assert cache.get("first") is None
+    assert cache.get("second") == second[0]
+
+
+def test_entries_hit_during_a_run_are_kept(tmp_path):
+    cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=150)
+    first, second = _extraction(str(tmp_path), "first"), _extraction(str(tmp_path), "second")
+    cache.put("first", *first)
+    with cache.run():
+        assert cache.get("first") == first[0]
+        cache.put("second", *second)
+    assert os.path.isfile(first[0]) and os.path.isfile(second[0])
@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("langchain_text_splitters")
+pytest.importorskip("nltk")
+
+from input_preprocessing.documents.utils.core import Chunk, Chunker
+
+
+def _chunk(tokens, page, source="doc.pdf"):
+    return Chunk(source, "pdf", page, page, " ".join(f"w{page}_{i}" for i in range(tokens)))
+
+
+def _merge_one_at_a_time(chunker, chunks):
+    """Reference: merge each chunk into the pending one and re-validate every step."""
+    result, current = [], None
+    for chunk in chunks:
+        if current is not None and current.source != chunk.source:
+            current = None
+        current = chunk if current is None else Chunk.merge_chunks(current, chunk)
+        if chunker._validate_chunk(current):
+            result.append(current)
+            current = None
+    return result
+
+
+def _summary(chunks):
+    return [(chunk.source, chunk.start, chunk.end, chunk.text) for chunk in chunks]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_merging_one_chunk_at_a_time(seed):
+    rng = random.Random(seed)
+    chunks = [
+        _chunk(rng.randint(1, 25), page, f"doc{page // 40}.pdf") for page in range(200)
+    ]
+    chunker = Chunker(min_chunk_tokens=20)
+    assert _summary(chunker.merge_small_chunks(chunks)) == _summary(_merge_one_at_a_time(chunker, chunks))
+
+
+def test_small_chunks_are_merged_across_pages():
+    merged, = Chunker(min_chunk_tokens=10).merge_small_chunks([_chunk(4, 1), _chunk(4, 2), _chunk(4, 3)])
+    assert (merged.start, merged.end) == (1, 3)
+    assert merged.text == " ".join([_chunk(4, 1).text, _chunk(4, 2).text, _chunk(4, 3).text])
+    assert merged._token_count == 12
+
+
+def test_run_closed_by_max_under_min_is_dropped():
+    chunker = Chunker(min_chunk_tokens=10, max_chunk_tokens=15)
+    result = chunker.merge_small_chunks([_chunk(6, 1), _chunk(12, 2), _chunk(3, 3)])
+    assert _summary(result) == _summary([_chunk(12, 2)])
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_chunks_meet_min_and_merged_chunks_respect_max(seed):
+    rng = random.Random(seed)
+    chunks = [_chunk(rng.randint(1, 20), page) for page in range(300)]
+    chunker = Chunker(min_chunk_tokens=10, max_chunk_tokens=15)
+    result = chunker.merge_small_chunks(chunks)
+    assert result
+    for chunk in result:
+        count = chunker.token_counter.count(chunk.text)
+        assert count >= 10
+        # Only a chunk that was already over the maximum on its own may exceed it
+        assert count <= 15 or chunk.start == chunk.end
+
+
+def test_runs_never_span_sources():
+    chunks = [_chunk(6, 1, "a.pdf"), _chunk(6, 1, "b.pdf"), _chunk(6, 2, "b.pdf")]
+    merged, = Chunker(min_chunk_tokens=10).merge_small_chunks(chunks)
+    assert merged.source == "b.pdf" and (merged.start, merged.end) == (1, 2)
@@ -0,0 +1,66 @@
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+ImageFont = pytest.importorskip("PIL.ImageFont")
+pytest.importorskip("pytesseract")
+
+from input_preprocessing.documents.filters.extract import OCRFilter
+
+
+def _text_image(foreground=0, background=255, mode="L"):
+    image = Image.new(mode, (640, 240), background)
+    draw = ImageDraw.Draw(image)
+    for row in range(8):
+        draw.text((20, 20 + 25 * row), "The quick brown fox jumps over the lazy dog 0123456789", fill=foreground)
+    return image
+
+
+def _sparse_text_image(size, lines, font_size, foreground=0, background=255, mode="L"):
+    image = Image.new(mode, size, background)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=font_size)
+    for row in range(lines):
+        draw.text((100, 100 + 2 * font_size * row), "Quarterly results and outlook", fill=foreground, font=font)
+    return image
+
+
+def test_black_text_on_white_is_ocred():
+    assert OCRFilter().skip_reason(_text_image()) is None
+
+
+def test_bilevel_scan_is_ocred():
+    assert OCRFilter().skip_reason(_text_image().convert("1")) is None
+
+
+def test_white_text_on_colour_is_ocred():
+    slide = _text_image(foreground=(255, 255, 255), background=(30, 60, 160), mode="RGB")
+    assert OCRFilter().skip_reason(slide) is None
+
+
+@pytest.mark.parametrize("lines", [1, 3])
+def test_slide_title_on_large_canvas_is_ocred(lines):
+    assert OCRFilter().skip_reason(_sparse_text_image((1920, 1080), lines, 36)) is None
+
+
+def test_figure_caption_is_ocred():
+    assert OCRFilter().skip_reason(_sparse_text_image((1200, 400), 1, 24)) is None
+
+
+def test_white_title_on_colour_slide_is_ocred():
+    slide = _sparse_text_image((1920, 1080), 1, 36, (255, 255, 255), (30, 60, 160), "RGB")
+    assert OCRFilter().skip_reason(slide) is None
+
+
+def test_flat_image_is_skipped():
+    assert OCRFilter().skip_reason(Image.new("L", (640, 240), 200)) == "skipped_low_entropy"
+
+
+def test_tiny_image_is_skipped():
+    assert OCRFilter().skip_reason(_text_image().resize((20, 10))) == "skipped_small"
+
+
+def test_smooth_photo_without_text_is_skipped():
+    ImageFilter = pytest.importorskip("PIL.ImageFilter")
+    photo = Image.effect_noise((640, 240), 5).filter(ImageFilter.GaussianBlur(4))
+    assert OCRFilter().skip_reason(photo) == "skipped_no_text"
@@ -0,0 +1,108 @@
+import zlib
+
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("langchain_text_splitters")
+pytest.importorskip("nltk")
+
+from input_preprocessing.documents.utils import retriever
+from input_preprocessing.documents.utils.core import Chunk
+from input_preprocessing.documents.utils.vector_index import FlatIndex, IVFIndex, MemmapIndex
+
+TOPICS = ["alpha", "beta", "gamma", "delta"]
+DIM = 16
+
+
+def _unit(rng, n):
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class FakeEncoder:
+    def encode(self, texts, **kwargs):
+        return np.concatenate([_unit(np.random.default_rng(zlib.crc32(t.encode())), 1) for t in texts])
+
+
+class FixedTopics:
+    def top_terms(self, texts, num_terms=10):
+        return TOPICS
+
+
+@pytest.fixture(autouse=True)
+def fake_encoder(monkeypatch):
+    monkeypatch.setattr(retriever, "get_encoder", lambda model_name=None: FakeEncoder())
+
+
+def _corpus(n=2000):
+    chunks = [Chunk(f"doc{i // 100}.pdf", "pdf", i % 100, i % 100, f"chunk {i}") for i in range(n)]
+    return chunks, _unit(np.random.default_rng(0), n)
+
+
+def _retriever(index, search_index=True):
+    chunks, embeddings = _corpus()
+    return retriever.Retriever(
+        chunks, embeddings=embeddings, index=index, topic_model=FixedTopics(), search_index=search_index
+    )
+
+
+def _select(index, search_index=True):
+    return _retriever(index, search_index).extract_key_chunks()
+
+
+def test_corpus_retrieval_searches_the_ivf_index(monkeypatch):
+    index = IVFIndex(nlist=32, nprobe=2, min_train_size=256)
+    searches, probed = [], []
+    search, list_ids = index.search, index._list_ids
+    monkeypatch.setattr(index, "search", lambda *args, **kwargs: searches.append(args) or search(*args, **kwargs))
+    monkeypatch.setattr(index, "_list_ids", lambda c: probed.append(c) or list_ids(c))
+
+    key_chunks = _select(index)
+
+    assert index.centroids is not None
+    assert len(searches) == len(TOPICS)
+    # Each query scored a few inverted lists, not the whole corpus
+    assert len(probed) < len(TOPICS) * index.nlist / 4
+    assert len(key_chunks) == 5 * len(TOPICS)
+    assert len({id(chunk) for chunk in key_chunks}) == len(key_chunks)
+    assert all(chunk._visited for chunk in key_chunks)
+
+
+def test_hits_map_back_to_their_chunks():
+    index = IVFIndex(nlist=32, nprobe=2, min_train_size=256)
+    key_chunks = _select(index)
+    ids = [int(chunk.text.split()[1]) for chunk in key_chunks]
+    assert [record["text"] for record in index.metadata(ids)] == [chunk.text for chunk in key_chunks]
+
+
+def test_flat_index_search_matches_in_memory_selection():
+    by_index = _select(FlatIndex())
+    in_memory = _select(None, search_index=False)
+    assert [chunk.text for chunk in by_index] == [chunk.text for chunk in in_memory]
+
+
+def test_chunks_outside_the_pass_are_never_returned():
+    index = FlatIndex()
+    # An earlier run indexed copies of the same vectors; their lower ids would win ties
+    earlier, earlier_embeddings = _corpus(500)
+    index.add(earlier_embeddings, metadata=[{"text": "earlier"}] * len(earlier))
+    key_chunks = _select(index)
+    assert [chunk.text for chunk in key_chunks] == [chunk.text for chunk in _select(None, search_index=False)]
+
+
+def test_corpus_retrieval_scores_the_quantized_store(tmp_path, monkeypatch):
+    index = MemmapIndex(str(tmp_path / "store"), quantization="int8")
+    scored = []
+    approximate_scores = index.store.approximate_scores
+    monkeypatch.setattr(
+        index.store, "approximate_scores", lambda query: scored.append(query) or approximate_scores(query)
+    )
+    selection = _retriever(index)
+    key_chunks = selection.extract_key_chunks()
+
+    assert len(scored) == len(TOPICS)
+    # The retriever keeps a view of the memory-mapped rows, not its own float32 copy
+    assert isinstance(selection.chunk_embeddings, np.memmap)
+    exact = {chunk.text for chunk in _select(None, search_index=False)}
+    assert len(exact & {chunk.text for chunk in key_chunks}) >= 0.9 * len(key_chunks)
@@ -0,0 +1,37 @@
+import numpy as np
+
+from input_preprocessing.audio.vad import EnergyVAD, SpeechMap
+
+SR = 16000
+
+
+def _noise(seconds, level, seed=0):
+    return np.random.default_rng(seed).normal(0, level, int(seconds * SR)).astype(np.float32)
+
+
+def test_speech_between_silences_is_found():
+    audio = _noise(60, 0.001)
+    audio[5 * SR:20 * SR] += _noise(15, 0.2, seed=1)
+    regions = EnergyVAD().detect(audio)
+    assert len(regions) == 1
+    start, stop = regions[0]
+    assert 4 * SR < start <= 5 * SR and 20 * SR <= stop < 21 * SR
+
+
+def test_recording_without_silence_is_kept_whole():
+    t = np.arange(20 * SR) / SR
+    audio = (0.3 * np.sin(2 * np.pi * 220 * t) * (0.75 + 0.25 * np.sin(2 * np.pi * 3 * t))).astype(np.float32)
+    regions = EnergyVAD().detect(audio)
+    assert regions == [(0, len(audio))]
+    assert SpeechMap(regions, len(audio)).stats()["skipped_ratio"] == 0.0
+
+
+def test_digital_silence_has_no_speech():
+    assert EnergyVAD().detect(np.zeros(10 * SR, dtype=np.float32)) == []
+
+
+def test_timestamps_map_back_to_the_recording():
+    speech_map = SpeechMap([(2 * SR, 5 * SR), (10 * SR, 12 * SR)], 15 * SR)
+    assert speech_map.to_original(1.0) == 3.0
+    assert speech_map.to_original(3.0, is_end=True) == 5.0
+    assert speech_map.to_original(3.5) == 10.5